@@ -1,6 +1,8 @@
 import re
 from pathlib import Path
 
+from mdx_pages import read_text, write_if_changed
+
 def add_testcase_links(content):
     """Add hyperlinks to test case references"""
     
@@ -48,13 +50,8 @@ def add_testcase_links(content):
 def process_file(file_path):
     """Process a single file"""
     try:
-        content = file_path.read_text(encoding="utf-8")
-        new_content = add_testcase_links(content)
-        
-        if content != new_content:
-            file_path.write_text(new_content, encoding="utf-8")
-            return True
-        return False
+        new_content = add_testcase_links(read_text(file_path))
+        return write_if_changed(file_path, new_content)
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return False
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark zephyr_export.py against the local mock server.
+
+Runs a full export for each concurrency setting and reports total time,
+requests/sec and p50/p95 request latency, e.g.
+
+    python scripts/benchmark_export.py --synthetic 2000 --latency 40 --jitter 20 --concurrency 1,8,16,32
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from zephyr_mock_server import add_mock_arguments, mock_from_args, make_server
+from snapshot import SnapshotWriter
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+def run_export(zephyr_export, concurrency: int, out_dir: Path, rate_limit=None):
+    """Run one export and return its measurements"""
+    samples = []
+    make_session = zephyr_export.make_session
+
+    def instrumented_session(pool_size):
+        session = make_session(pool_size)
+        session.hooks["response"].append(
+            lambda r, *args, **kwargs: samples.append((r.elapsed.total_seconds(), r.status_code)))
+        return session
+
+    # Fresh limiter per run so one setting does not inherit another's learned rate
+    limiter = zephyr_export.LIMITER
+    if rate_limit:
+        zephyr_export.LIMITER = zephyr_export.RateLimiter(rate=rate_limit, max_rate=rate_limit)
+    else:
+        zephyr_export.LIMITER = zephyr_export.RateLimiter(rate=limiter.rate, max_rate=limiter.max_rate)
+    zephyr_export.make_session = instrumented_session
+    writer = SnapshotWriter(out_dir / f"export-c{concurrency}.jsonl")
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            count, failed = asyncio.run(zephyr_export.export(writer, concurrency))
+        elapsed = time.perf_counter() - started
+        writer.close()
+    finally:
+        zephyr_export.make_session = make_session
+        zephyr_export.LIMITER = limiter
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    return {
+        "concurrency": concurrency,
+        "testcases": count,
+        "failed": len(failed),
+        "requests": len(samples),
+        "throttled": sum(1 for s in samples if s[1] == 429),
+        "total_s": round(elapsed, 3),
+        "requests_per_s": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zephyr_export.py against a local mock Zephyr API")
+    add_mock_arguments(parser)
+    parser.add_argument("--concurrency", default="1,4,16,32",
+                        help="comma-separated concurrency settings to compare (default: %(default)s)")
+    parser.add_argument("--rate-limit", type=float,
+                        help="initial and maximum limiter rate in requests/s (default: exporter settings)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server = make_server(mock, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # zephyr_export reads its configuration at import time
+    os.environ["ZEPHYR_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v2"
+    os.environ.setdefault("ZEPHYR_TOKEN", "benchmark")
+    import zephyr_export
+
+    print(f"Mock API serving {len(mock.testcases)} test cases at {os.environ['ZEPHYR_BASE_URL']}\n")
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+                result = run_export(zephyr_export, concurrency, Path(tmp), args.rate_limit)
+                results.append(result)
+                print(f"  concurrency={concurrency}: {result['total_s']}s")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print()
+    print(f"{'concurrency':>11} {'total s':>8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'429s':>6} {'failed':>7}")
+    for r in results:
+        print(f"{r['concurrency']:>11} {r['total_s']:>8} {r['requests']:>9} {r['requests_per_s']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['throttled']:>6} {r['failed']:>7}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,193 +1,155 @@
+"""Build the Manual group of docs.json from the pages under docs/manual.
+
+Page paths are inserted into a trie, one node per directory, so pages nest
+to any depth. Each directory becomes a group listing its own pages, then one
+group per subdirectory, both sorted by name.
+
+The pages are every page under docs/manual, generated or written by hand;
+regenerate.py passes its in-memory pages instead.
+"""
 import json
+import os
 from pathlib import Path
-from collections import defaultdict
+
+MANUAL_DIR = Path("docs/manual")
+MANUAL_PREFIX = "docs/manual/"
+
+class PageTrie:
+    """The pages of a directory and its subdirectories, by name"""
+
+    __slots__ = ("pages", "children")
+
+    def __init__(self):
+        self.pages = []
+        self.children = {}
+
+    def insert(self, page: str, parts):
+        """Add `page` under the directories `parts[:-1]`"""
+        node = self
+        for part in parts[:-1]:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = PageTrie()
+            node = child
+        node.pages.append(page)
+
+    def nav(self) -> list:
+        """Mintlify `pages` for this directory"""
+        items = sorted(self.pages)
+        for name in sorted(self.children):
+            items.append({"group": format_title(name), "pages": self.children[name].nav()})
+        return items
 
 def build_hierarchical_navigation(pages):
-    """Build hierarchical navigation structure from page paths"""
-    
-    # Organize pages by their path structure
-    structure = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    root_pages = []
-    
+    """Trie of the `pages` under docs/manual/, e.g. docs/manual/gidr/workflows/nodes"""
+    root = PageTrie()
     for page in pages:
-        if not page.startswith("docs/manual/"):
-            continue
-        
-        # Remove docs/manual/ prefix
-        rel_path = page.replace("docs/manual/", "")
-        parts = rel_path.split("/")
-        
-        if len(parts) == 1:
-            # Top level page (e.g., index, documentation-structure)
-            root_pages.append(page)
-        elif len(parts) == 2:
-            # Second level (e.g., authentication/signing-in)
-            section = parts[0]
-            if "_pages" not in structure[section]:
-                structure[section]["_pages"] = []
-            structure[section]["_pages"].append(page)
-        elif len(parts) == 3:
-            # Third level (e.g., authentication/signing-in/error-cases)
-            section = parts[0]
-            subsection = parts[1]
-            if "_pages" not in structure[section][subsection]:
-                structure[section][subsection]["_pages"] = []
-            structure[section][subsection]["_pages"].append(page)
-        elif len(parts) == 4:
-            # Fourth level (e.g., gidr/ingestion-settings/data-sources/files)
-            section = parts[0]
-            subsection = parts[1]
-            subsubsection = parts[2]
-            structure[section][subsection][subsubsection].append(page)
-    
-    structure["_root"] = root_pages
-    return structure
+        if page.startswith(MANUAL_PREFIX):
+            root.insert(page, page[len(MANUAL_PREFIX):].split("/"))
+    return root
 
 def format_title(path_part):
     """Convert path part to readable title"""
     return path_part.replace("-", " ").title()
 
 def build_nav_groups(structure):
-    """Build Mintlify navigation groups from structure"""
-    groups = []
-    
-    # Root pages first
-    if "_root" in structure:
-        for page in sorted(structure["_root"]):
-            groups.append(page)
-    
-    # Then organized sections
-    for section in sorted(structure.keys()):
-        if section == "_root":
-            continue
-        
-        section_pages = structure[section]
-        
-        # Check if this section has direct pages or subsections
-        has_direct_pages = "_pages" in section_pages and section_pages["_pages"]
-        has_subsections = any(k != "_pages" for k in section_pages.keys())
-        
-        if has_subsections:
-            # Create a group for this section
-            section_group = {
-                "group": format_title(section),
-                "pages": []
-            }
-            
-            # Add direct pages first
-            if has_direct_pages:
-                section_group["pages"].extend(sorted(section_pages["_pages"]))
-            
-            # Add subsections
-            for subsection in sorted(section_pages.keys()):
-                if subsection == "_pages":
-                    continue
-                
-                subsection_data = section_pages[subsection]
-                
-                # Check if subsection has direct pages or sub-subsections
-                has_sub_pages = "_pages" in subsection_data and subsection_data["_pages"]
-                has_subsubsections = any(k != "_pages" for k in subsection_data.keys())
-                
-                if has_subsubsections:
-                    # Create nested group
-                    subsection_group = {
-                        "group": format_title(subsection),
-                        "pages": []
-                    }
-                    
-                    # Add direct pages
-                    if has_sub_pages:
-                        subsection_group["pages"].extend(sorted(subsection_data["_pages"]))
-                    
-                    # Add sub-subsections as pages
-                    for subsubsection in sorted(subsection_data.keys()):
-                        if subsubsection == "_pages":
-                            continue
-                        subsection_group["pages"].extend(sorted(subsection_data[subsubsection]))
-                    
-                    section_group["pages"].append(subsection_group)
-                elif has_sub_pages:
-                    # Subsection with only pages - add as nested group
-                    subsection_group = {
-                        "group": format_title(subsection),
-                        "pages": sorted(subsection_data["_pages"])
-                    }
-                    section_group["pages"].append(subsection_group)
-            
-            groups.append(section_group)
-        elif has_direct_pages:
-            # Section with only direct pages - add as simple group
-            groups.append({
-                "group": format_title(section),
-                "pages": sorted(section_pages["_pages"])
-            })
-    
-    return groups
+    """Build Mintlify navigation groups from a PageTrie"""
+    return structure.nav()
 
-def main():
-    base_dir = Path(".")
-    docs_json_path = base_dir / "docs.json"
-    
+def page_path(mdx_file):
+    """Navigation entry for an MDX file under docs/, e.g. docs/manual/gidr/prompts"""
+    rel_path = mdx_file.relative_to(Path("docs"))
+    page_path = str(rel_path)[:-4]  # Remove .mdx
+    if not page_path.startswith("docs/"):
+        page_path = f"docs/{page_path}"
+    return page_path
+
+def manual_pages(manual_dir=MANUAL_DIR):
+    """Navigation entries of the pages under `manual_dir`, generated or not"""
+    return [page_path(path) for path in manual_dir.rglob("*.mdx")]
+
+def page_groups(items, groups=()) -> dict:
+    """{page: (group titles it is nested in)} for a Mintlify `pages` list"""
+    located = {}
+    for item in items:
+        if isinstance(item, dict):
+            located.update(page_groups(item.get("pages", []), groups + (item.get("group"),)))
+        else:
+            located[item] = groups
+    return located
+
+class NavChange:
+    """How a new Manual group differs from the one in docs.json"""
+
+    __slots__ = ("groups", "changed", "added", "removed", "moved")
+
+    def __init__(self, old, new):
+        self.groups = new
+        self.changed = old != new
+        before, after = page_groups(old or []), page_groups(new)
+        self.added = sorted(after.keys() - before.keys())
+        self.removed = sorted(before.keys() - after.keys())
+        self.moved = sorted((page, before[page], after[page]) for page in before.keys() & after.keys()
+                            if before[page] != after[page])
+
+    def report(self) -> list:
+        """Lines describing the change, empty if there is none"""
+        if not self.changed:
+            return []
+        lines = [f"+ {page}" for page in self.added] + [f"- {page}" for page in self.removed]
+        lines += [f"~ {page}: {' > '.join(old) or '(top)'} -> {' > '.join(new) or '(top)'}"
+                  for page, old, new in self.moved]
+        return lines or ["(order changed)"]
+
+def update_docs_json(manual_pages, docs_json_path=Path("docs.json")) -> NavChange:
+    """Replace the Manual group of docs.json with a hierarchy of `manual_pages`.
+
+    docs.json is only written, atomically, when the group changed: any write
+    makes Mintlify reload the whole site.
+    """
     # Read existing docs.json
     with open(docs_json_path, "r") as f:
         docs = json.load(f)
     
-    # Get all manual pages
-    manual_pages = []
-    manual_dir = Path("docs/manual")
-    for mdx_file in manual_dir.rglob("*.mdx"):
-        rel_path = mdx_file.relative_to(Path("docs"))
-        page_path = str(rel_path)[:-4]  # Remove .mdx
-        if not page_path.startswith("docs/"):
-            page_path = f"docs/{page_path}"
-        manual_pages.append(page_path)
-    
     # Build hierarchical structure
     structure = build_hierarchical_navigation(sorted(manual_pages))
     
     # Build navigation groups
     nav_groups = build_nav_groups(structure)
     
-    # Update docs.json
-    groups = docs.get("navigation", {}).get("groups", [])
+    groups = docs.setdefault("navigation", {}).setdefault("groups", [])
+    manual = next((group for group in groups if group.get("group") == "Manual"), None)
+    change = NavChange(manual.get("pages") if manual else None, nav_groups)
+    if not change.changed:
+        return change
     
-    # Find Manual group and replace it
-    found = False
-    for i, group in enumerate(groups):
-        if group.get("group") == "Manual":
-            # Replace with hierarchical structure
-            groups[i] = {
-                "group": "Manual",
-                "pages": nav_groups
-            }
-            found = True
-            break
-    
-    if not found:
+    if manual is not None:
+        # Replace with hierarchical structure
+        manual["pages"] = nav_groups
+    else:
         # Manual group not found, add it
-        groups.append({
-            "group": "Manual",
-            "pages": nav_groups
-        })
-    
-    docs["navigation"]["groups"] = groups
+        groups.append({"group": "Manual", "pages": nav_groups})
     
-    # Write back
-    with open(docs_json_path, "w") as f:
+    # Write back atomically
+    tmp = docs_json_path.with_name(docs_json_path.name + ".tmp")
+    with open(tmp, "w") as f:
         json.dump(docs, f, indent=2)
         f.write("\n")
-    
-    # Verify write
-    with open(docs_json_path, "r") as f:
-        verify_docs = json.load(f)
-        for group in verify_docs.get("navigation", {}).get("groups", []):
-            if group.get("group") == "Manual":
-                if group["pages"] and isinstance(group["pages"][0], dict):
-                    print("✅ Successfully wrote hierarchical structure")
-                else:
-                    print("❌ Structure not written correctly")
-                break
+    os.replace(tmp, docs_json_path)
+    return change
+
+def main():
+    docs_json_path = Path("docs.json")
+    
+    change = update_docs_json(manual_pages(), docs_json_path)
+    nav_groups = change.groups
+    if change.changed:
+        print(f"Updated {docs_json_path}: {len(change.added)} added, {len(change.removed)} removed, "
+              f"{len(change.moved)} moved")
+        for line in change.report():
+            print(f"  {line}")
+    else:
+        print(f"{docs_json_path} is up to date")
     
     print(f"Built hierarchical navigation with {len(nav_groups)} top-level items")
     print("\nNavigation structure:")
@@ -0,0 +1,377 @@
+"""Rule-driven test case categorization.
+
+Categories and test types are defined in data/categorization_rules.json. Each
+rule has a category and a `match` list; an entry is a keyword, or a list of
+keywords that must all occur. Keywords are plain substrings of the lowercased
+name + objective, so "file" also matches "profile". The first matching rule
+wins; a rule's nested `rules` refine its category the same way.
+
+All keywords are compiled into one Aho-Corasick automaton, so a test case's
+text is scanned once and rules are resolved against the set of hits.
+
+A test case's labels are every matching category and test type in rule
+order; the first of each is its primary label. Labels are cached in
+data/.classification_cache.json by test case key and a hash of the text the
+rules match against plus the rule-set version, so unchanged test cases are not
+reclassified until the rules change. Entries for test cases a run did not see
+are dropped when the cache is saved.
+ClassificationIndex holds a run's labels with inverted lists for page lookups.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+
+from testcase_model import TestCase
+
+RULES_PATH = Path("data/categorization_rules.json")
+CACHE_PATH = Path("data/.classification_cache.json")
+
+# Parts of the rule table that affect labels; other keys do not invalidate the cache
+RULE_KEYS = ("categories", "default_category", "test_types", "default_test_type")
+CACHE_FORMAT = 3
+
+class KeywordMatcher:
+    """Aho-Corasick automaton reporting every keyword that occurs in a text"""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        outputs = [set()]
+        for word in set(keywords):
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(word)
+
+        # Breadth-first, so a state's failure target is complete before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                outputs[nxt] |= outputs[self.fail[nxt]]
+        self.out = [frozenset(o) for o in outputs]
+
+    def find(self, text: str) -> set:
+        goto, fail, out = self.goto, self.fail, self.out
+        hits = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits |= out[state]
+        return hits
+
+def _clauses(match):
+    """Normalize a `match` list to a tuple of keyword sets (any set may match)"""
+    return tuple(frozenset([m] if isinstance(m, str) else m) for m in match)
+
+class Rule:
+    __slots__ = ("label", "clauses", "rules")
+
+    def __init__(self, label, match, rules=()):
+        self.label = label
+        self.clauses = _clauses(match)
+        self.rules = rules
+
+    def matches(self, hits) -> bool:
+        return any(clause <= hits for clause in self.clauses)
+
+def _category_rules(specs):
+    return tuple(Rule(tuple(spec["category"].split(" > ")), spec["match"],
+                      _category_rules(spec.get("rules") or ()))
+                 for spec in specs)
+
+def _keywords(rules):
+    for rule in rules:
+        for clause in rule.clauses:
+            yield from clause
+        yield from _keywords(rule.rules)
+
+def _resolve(rules, hits, default):
+    for rule in rules:
+        if rule.matches(hits):
+            return _resolve(rule.rules, hits, rule.label)
+    return default
+
+class Categorizer:
+    """Compiled category and test type rules"""
+
+    def __init__(self, spec: dict):
+        versioned = {k: spec.get(k) for k in RULE_KEYS}
+        versioned["cache_format"] = CACHE_FORMAT
+        canonical = json.dumps(versioned, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        self.rules = _category_rules(spec["categories"])
+        self.default = tuple(spec.get("default_category", "uncategorized").split(" > "))
+        self.type_rules = tuple(Rule(t["type"], t["match"]) for t in spec.get("test_types") or ())
+        self.default_test_type = spec.get("default_test_type", "happy")
+        self.matcher = KeywordMatcher(list(_keywords(self.rules)) + list(_keywords(self.type_rules)))
+
+    @classmethod
+    def load(cls, path=RULES_PATH) -> "Categorizer":
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def hits(self, text: str) -> set:
+        return self.matcher.find(text)
+
+    def category(self, text: str, hits=None) -> tuple:
+        return _resolve(self.rules, self.hits(text) if hits is None else hits, self.default)
+
+    def test_type(self, text: str, hits=None) -> str:
+        return _resolve(self.type_rules, self.hits(text) if hits is None else hits, self.default_test_type)
+
+    def categories(self, text: str, hits=None) -> tuple:
+        """Every matching category, primary first"""
+        hits = self.hits(text) if hits is None else hits
+        found = []
+        for rule in self.rules:
+            if rule.matches(hits):
+                label = _resolve(rule.rules, hits, rule.label)
+                if label not in found:
+                    found.append(label)
+        return tuple(found) or (self.default,)
+
+    def test_types(self, text: str, hits=None) -> tuple:
+        """Every matching test type, primary first"""
+        hits = self.hits(text) if hits is None else hits
+        return tuple(rule.label for rule in self.type_rules if rule.matches(hits)) or (self.default_test_type,)
+
+    def labels(self, text: str) -> tuple:
+        """(categories, test types) from a single scan of `text`"""
+        hits = self.hits(text)
+        return self.categories(text, hits), self.test_types(text, hits)
+
+def _rule_stats(rules, prefix, out):
+    """Zeroed statistics for every rule, keyed by its position id (e.g. "3.1")"""
+    for n, rule in enumerate(rules, start=1):
+        rule_id = f"{prefix}{n}"
+        label = " > ".join(rule.label) if isinstance(rule.label, tuple) else rule.label
+        out[rule_id] = {"rule": rule_id, "label": label,
+                        "match": [" + ".join(sorted(clause)) for clause in rule.clauses],
+                        "matched": 0, "won": 0, "shadowed": 0, "time_ns": 0, "shadowed_by": Counter()}
+        _rule_stats(rule.rules, f"{rule_id}.", out)
+    return out
+
+def _profile_resolve(rules, prefix, hits, stats):
+    """_resolve that evaluates every sibling, recording wins and shadowing"""
+    winner = None
+    for n, rule in enumerate(rules, start=1):
+        rule_id = f"{prefix}{n}"
+        s = stats[rule_id]
+        started = time.perf_counter_ns()
+        matched = rule.matches(hits)
+        s["time_ns"] += time.perf_counter_ns() - started
+        if not matched:
+            continue
+        s["matched"] += 1
+        if winner is None:
+            winner = (rule_id, rule)
+            s["won"] += 1
+        else:
+            s["shadowed"] += 1
+            s["shadowed_by"][winner[0]] += 1
+    if winner is not None:
+        _profile_resolve(winner[1].rules, f"{winner[0]}.", hits, stats)
+
+def profile_rules(categorizer: Categorizer, texts) -> dict:
+    """Rule-level statistics for classifying `texts`.
+
+    For every category and test type rule: how often it matched, how often
+    it decided the label, how often an earlier sibling won although it
+    matched (and which one), and time spent evaluating it. Also reports
+    keyword hit counts and rules that never matched.
+    """
+    category_stats = _rule_stats(categorizer.rules, "", {})
+    type_stats = _rule_stats(categorizer.type_rules, "t", {})
+    keywords = Counter()
+    scan_ns = resolve_ns = count = 0
+    for text in texts:
+        count += 1
+        started = time.perf_counter_ns()
+        hits = categorizer.hits(text)
+        scanned = time.perf_counter_ns()
+        _profile_resolve(categorizer.rules, "", hits, category_stats)
+        _profile_resolve(categorizer.type_rules, "t", hits, type_stats)
+        resolve_ns += time.perf_counter_ns() - scanned
+        scan_ns += scanned - started
+        keywords.update(hits)
+
+    def finish(stats):
+        rows = []
+        for s in stats.values():
+            row = {k: v for k, v in s.items() if k != "time_ns"}
+            row["time_ms"] = round(s["time_ns"] / 1e6, 3)
+            row["shadowed_by"] = dict(s["shadowed_by"].most_common())
+            rows.append(row)
+        return rows
+
+    all_keywords = set(_keywords(categorizer.rules)) | set(_keywords(categorizer.type_rules))
+    report = {
+        "rules_version": categorizer.version,
+        "testcases": count,
+        "scan_ms": round(scan_ns / 1e6, 3),
+        "resolve_ms": round(resolve_ns / 1e6, 3),
+        "categories": finish(category_stats),
+        "test_types": finish(type_stats),
+        "keywords": {k: keywords.get(k, 0) for k in sorted(all_keywords, key=lambda k: (-keywords.get(k, 0), k))},
+    }
+    report["dead_rules"] = [r["rule"] for r in report["categories"] + report["test_types"] if not r["matched"]]
+    return report
+
+def content_hash(tc: TestCase, version: str) -> str:
+    """Hash of exactly what the classifier reads (the test case's search text) and the rule-set version"""
+    return hashlib.sha256(f"{version}\0{tc.search_text}".encode("utf-8")).hexdigest()
+
+class ClassificationCache:
+    """Persistent (categories, test types) labels per test case for one rule-set version"""
+
+    def __init__(self, categorizer: Categorizer, path=CACHE_PATH):
+        self.categorizer = categorizer
+        self.path = Path(path)
+        self.entries = {}
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            data = {}
+        except json.JSONDecodeError as e:
+            print(f"Warning: Ignoring unreadable cache {self.path}: {e}")
+            data = {}
+        if data.get("rules") == categorizer.version:
+            self.entries = data.get("entries") or {}
+
+    def labels(self, tc: TestCase) -> tuple:
+        if tc.classification is not None:
+            return tc.classification
+        digest = content_hash(tc, self.categorizer.version)
+        self.seen.add(tc.key)
+        entry = self.entries.get(tc.key)
+        if entry and entry[0] == digest:
+            self.hits += 1
+            labels = (tuple(tuple(c.split(" > ")) for c in entry[1]), tuple(entry[2]))
+        else:
+            self.misses += 1
+            labels = self.categorizer.labels(tc.search_text)
+            if tc.key:
+                self.entries[tc.key] = [digest, [" > ".join(c) for c in labels[0]], list(labels[1])]
+                self.dirty = True
+        tc.classification = labels
+        return labels
+
+    def save(self, prune=False):
+        """Write the cache; with `prune`, drop entries for test cases not seen in this run.
+
+        Only a run that classified the whole snapshot may prune: a partial run
+        (e.g. one --category) would drop the labels of every other test case.
+        """
+        stale = self.entries.keys() - self.seen if prune and self.seen else ()
+        for key in stale:
+            del self.entries[key]
+        if not (self.dirty or stale):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        data = {"rules": self.categorizer.version, "entries": self.entries}
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+_default = None
+_cache = None
+
+def default_categorizer() -> Categorizer:
+    """The categorizer for data/categorization_rules.json, compiled on first use"""
+    global _default
+    if _default is None:
+        _default = Categorizer.load()
+    return _default
+
+def classification_cache() -> ClassificationCache:
+    global _cache
+    if _cache is None:
+        _cache = ClassificationCache(default_categorizer())
+    return _cache
+
+def save_cache(prune=False):
+    """Persist labels computed in this run; `prune` only after classifying the whole snapshot"""
+    if _cache is not None:
+        _cache.save(prune)
+
+def _labels(tc: TestCase) -> tuple:
+    # Test cases classified earlier (e.g. sent to a worker process) need no cache or categorizer
+    if tc.classification is not None:
+        return tc.classification
+    return classification_cache().labels(tc)
+
+def categorize_testcase(tc: TestCase) -> tuple:
+    """Category tuple for a test case, e.g. ("gidr", "workflows")"""
+    return _labels(tc)[0][0]
+
+def classify_test_type(tc: TestCase) -> str:
+    """Test type of a test case: happy, negative, edge, performance or security"""
+    return _labels(tc)[1][0]
+
+def topic_labels(tc: TestCase) -> tuple:
+    """Every category whose rules match the test case, primary first"""
+    return _labels(tc)[0]
+
+def type_labels(tc: TestCase) -> tuple:
+    """Every test type whose rules match the test case, primary first"""
+    return _labels(tc)[1]
+
+class ClassificationIndex:
+    """Topic and test type labels of a run's test cases, with inverted lists.
+
+    Built once per run; pages then look up their test cases by topic and
+    type. `topics` optionally gives each test case's primary topic (e.g.
+    after the similarity fallback). With `multi_label` a test case is also
+    listed under every other topic whose rules match it.
+    """
+
+    def __init__(self, testcases, topics=None, multi_label=False):
+        self.testcases = list(testcases)
+        self.topic_ids = defaultdict(list)
+        self.type_ids = defaultdict(list)
+        default = default_categorizer().default if multi_label else None
+        for i, tc in enumerate(self.testcases):
+            labels = topic_labels(tc)
+            primary = topics[i] if topics is not None else labels[0]
+            self.topic_ids[primary].append(i)
+            if multi_label:
+                for label in labels:
+                    if label != primary and label != default:
+                        self.topic_ids[label].append(i)
+            for label in type_labels(tc):
+                self.type_ids[label].append(i)
+
+    def categorized(self) -> dict:
+        """{topic: [test cases]} in snapshot order"""
+        return {topic: [self.testcases[i] for i in ids] for topic, ids in self.topic_ids.items()}
+
+    def select(self, topic, test_type=None) -> list:
+        """Test cases under `topic`, optionally only those labelled `test_type`"""
+        ids = self.topic_ids.get(topic, [])
+        if test_type is not None:
+            typed = set(self.type_ids.get(test_type, ()))
+            ids = [i for i in ids if i in typed]
+        return [self.testcases[i] for i in ids]
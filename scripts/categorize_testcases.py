@@ -1,120 +1,103 @@
+import argparse
 import json
 from pathlib import Path
-from collections import defaultdict
 
-def categorize_testcase(tc):
-    """Categorize a test case based on its name, objective, and content"""
-    key = tc.get("key", "")
-    name = (tc.get("name") or "").lower()
-    objective = (tc.get("objective") or "").lower()
-    text = f"{name} {objective}".lower()
-    
-    categories = []
-    
-    # Authentication & Onboarding
-    if any(word in text for word in ["sign in", "signin", "login", "log in", "sign-in"]):
-        if "invalid" in text or "error" in text:
-            categories.append(("authentication", "signing-in", "error-cases"))
-        else:
-            categories.append(("authentication", "signing-in"))
-    elif any(word in text for word in ["sign up", "signup", "register", "registration", "sign-up"]):
-        if "invalid" in text or "error" in text:
-            categories.append(("authentication", "signing-up", "error-cases"))
-        else:
-            categories.append(("authentication", "signing-up"))
-    elif "landing page" in text or "landing" in text:
-        categories.append(("authentication", "landing-page"))
-    elif "forgot password" in text or "reset password" in text or "change password" in text:
-        categories.append(("authentication", "signing-in", "password-management"))
-    
-    # Organizations and Teams
-    elif any(word in text for word in ["create team", "create a team", "team creation"]):
-        categories.append(("organizations", "create-team"))
-    elif "member profile" in text or "profile" in text:
-        categories.append(("organizations", "member-profile"))
-    elif "organization settings" in text or "org settings" in text:
-        categories.append(("organizations", "organization-settings"))
-    elif "invite member" in text or "invite" in text:
-        categories.append(("organizations", "invite-members"))
-    
-    # GIDRs (top level)
-    elif "analytics" in text:
-        categories.append(("gidrs", "analytics"))
-    elif "mcp server" in text or "mcp" in text:
-        categories.append(("gidrs", "mcp-server"))
-    elif "language selection" in text or "language" in text:
-        categories.append(("gidrs", "language-selection"))
-    elif "create gidr" in text and "team" in text:
-        categories.append(("gidrs", "create-gidr"))
-    
-    # GIDR Info
-    elif "gidr info" in text or "info popup" in text:
-        categories.append(("gidr", "info", "gidr-info"))
-    
-    # Prompts
-    elif "prompt" in text:
-        categories.append(("gidr", "prompts"))
-    
-    # Ingestion Settings
-    elif "data source" in text or "data sources" in text:
-        categories.append(("gidr", "ingestion-settings", "data-sources"))
-    elif "file" in text and ("upload" in text or "ingest" in text):
-        categories.append(("gidr", "ingestion-settings", "data-sources", "files"))
-    elif "url" in text and ("add" in text or "ingest" in text):
-        categories.append(("gidr", "ingestion-settings", "data-sources", "urls"))
-    elif "connector" in text:
-        categories.append(("gidr", "ingestion-settings", "data-sources", "connectors"))
-    elif "database" in text:
-        categories.append(("gidr", "ingestion-settings", "data-sources", "database"))
-    elif "tag" in text:
-        categories.append(("gidr", "ingestion-settings", "tags"))
-    
-    # Design
-    elif "gidget" in text or "gidgets library" in text:
-        categories.append(("gidr", "design", "gidgets-library"))
-    elif "studio" in text:
-        categories.append(("gidr", "design", "studio"))
-    
-    # Workflows
-    elif "workflow" in text or "work flow" in text:
-        categories.append(("gidr", "workflows"))
-    elif "node" in text and ("workflow" in text or "flow" in text):
-        categories.append(("gidr", "workflows", "nodes"))
-    
-    # Default fallback
-    if not categories:
-        categories.append(("uncategorized",))
-    
-    return categories[0] if categories else ("uncategorized",)
+from snapshot import iter_testcases
+from snapshot_db import save_categories
+from categorization import (ClassificationIndex, categorize_testcase, classification_cache, default_categorizer,
+                            profile_rules, save_cache)
+from similarity import DEFAULT_THRESHOLD, classify_uncategorized
+from testcase_model import load
+
+CATEGORIES_PATH = Path("data/testcase_categories.json")
+PROFILE_PATH = Path("data/categorization_profile.json")
+
+def classification_index(testcases, categorize_testcase=categorize_testcase, similarity=None, multi_label=False):
+    """Classify test cases once and index them by topic and test type.
+
+    With `similarity` (a threshold), test cases the rules leave uncategorized
+    go to their nearest category by TF-IDF similarity; see similarity.py.
+    With `multi_label`, test cases also appear under secondary topics.
+    """
+    testcases = list(testcases)
+    labels = [categorize_testcase(tc) for tc in testcases]
+    if similarity is not None:
+        labels, _ = classify_uncategorized(testcases, labels, threshold=similarity)
+    return ClassificationIndex(testcases, labels, multi_label)
+
+def categorize(testcases, categorize_testcase=categorize_testcase, similarity=None, multi_label=False):
+    """Group test cases by category tuple, keeping snapshot order within each"""
+    return classification_index(testcases, categorize_testcase, similarity, multi_label).categorized()
+
+def add_classification_arguments(parser):
+    parser.add_argument("--similarity", action="store_true",
+                        help="assign uncategorized test cases to the most similar category (needs NumPy)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum cosine similarity for --similarity (default: %(default)s)")
+    parser.add_argument("--multi-label", action="store_true",
+                        help="also list test cases under every other topic whose rules match them")
+
+def similarity_threshold(args):
+    return args.threshold if args.similarity else None
+
+def category_mapping(categorized) -> dict:
+    """{"a > b": [keys]} form of a categorize() result"""
+    return {' > '.join(category): [tc.key for tc in tcs] for category, tcs in categorized.items()}
+
+def save_mapping(categorized, output=CATEGORIES_PATH):
+    output.write_text(json.dumps(category_mapping(categorized), indent=2), encoding="utf-8")
+    return output
+
+def print_profile(report):
+    """Summary table of a profile_rules() report"""
+    print(f"Rule profile for {report['testcases']} test cases "
+          f"(keyword scan {report['scan_ms']:.1f}ms, rule resolution {report['resolve_ms']:.1f}ms)\n")
+    print(f"{'rule':<8} {'label':<58} {'matched':>7} {'won':>5} {'shadowed':>8} {'ms':>7}  shadowed by")
+    for row in report["categories"] + report["test_types"]:
+        shadowed_by = ", ".join(f"{rule} ({n})" for rule, n in row["shadowed_by"].items())
+        dead = "  (never matched)" if not row["matched"] else ""
+        print(f"{row['rule']:<8} {row['label']:<58} {row['matched']:>7} {row['won']:>5} {row['shadowed']:>8} "
+              f"{row['time_ms']:>7.3f}  {shadowed_by}{dead}")
+    unused = [k for k, n in report["keywords"].items() if not n]
+    if unused:
+        print(f"\nKeywords that never occur: {', '.join(unused)}")
 
 def main():
-    src = Path("data/zephyr_testcases.json")
-    testcases = json.loads(src.read_text(encoding="utf-8"))
-    
-    categorized = defaultdict(list)
-    
-    for tc in testcases:
-        category = categorize_testcase(tc)
-        categorized[category].append(tc)
+    parser = argparse.ArgumentParser(description="Categorize the snapshot's test cases")
+    add_classification_arguments(parser)
+    parser.add_argument("--profile", nargs="?", const=str(PROFILE_PATH), metavar="PATH",
+                        help=f"record per-rule hits, shadowing and time to a JSON report (default path: {PROFILE_PATH})")
+    args = parser.parse_args()
+
+    testcases = list(load(iter_testcases()))
+    categorized = categorize(testcases, similarity=similarity_threshold(args), multi_label=args.multi_label)
     
     # Print summary
     print("Test Case Categorization Summary:\n")
     for category, tcs in sorted(categorized.items()):
         print(f"{' > '.join(category)}: {len(tcs)} test cases")
         for tc in tcs[:3]:  # Show first 3
-            print(f"  - {tc['key']}: {tc['name']}")
+            print(f"  - {tc.key}: {tc.name}")
         if len(tcs) > 3:
             print(f"  ... and {len(tcs) - 3} more")
         print()
     
-    # Save mapping
-    mapping = {}
-    for category, tcs in categorized.items():
-        mapping[' > '.join(category)] = [tc['key'] for tc in tcs]
-    
-    output = Path("data/testcase_categories.json")
-    output.write_text(json.dumps(mapping, indent=2), encoding="utf-8")
+    output = save_mapping(categorized)
     print(f"\nSaved categorization to {output}")
+    cache = classification_cache()
+    save_cache(prune=True)
+    print(f"Classified {cache.misses} test cases, reused {cache.hits} cached labels")
+    db = save_categories(category_mapping(categorized))
+    if db:
+        print(f"Indexed categories in {db}")
+
+    if args.profile:
+        # Profiled on the raw rules, bypassing the label cache
+        report = profile_rules(default_categorizer(), [tc.search_text for tc in testcases])
+        Path(args.profile).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print()
+        print_profile(report)
+        print(f"\nSaved rule profile to {args.profile}")
     
     return categorized
 
@@ -1,124 +1,40 @@
+import argparse
 import json
 import re
 from pathlib import Path
 from collections import defaultdict
 
-def clean(s: str) -> str:
-    return (s or "").replace("\r\n", "\n").strip()
+import html_markdown
+import testcase_model
+from build_hierarchical_nav import page_path
+from mdx_pages import AUTO_BEGIN, AUTO_END, PageManifest, page_inputs, parse_page, read_text, source_version, \
+    write_if_changed
+from snapshot import iter_testcases, select_testcases
+from snapshot_db import save_categories
+from categorization import categorize_testcase, save_cache
+from categorize_testcases import add_classification_arguments, categorize, similarity_threshold
+from testcase_model import TestCase, load
+from transform_pages import transform_text
 
-def pick(step: dict, *keys: str) -> str:
-    for k in keys:
-        v = step.get(k)
-        if isinstance(v, str) and v.strip():
-            return v.strip()
-    return ""
+# Pages rendered by an older version of this script are rendered again
+PAGE_VERSION = source_version(__file__, testcase_model.__file__, html_markdown.__file__)
 
-def categorize_testcase(tc):
-    """Improved categorization"""
-    name = (tc.get("name") or "").lower()
-    objective = (tc.get("objective") or "").lower()
-    text = f"{name} {objective}".lower()
-    
-    # Authentication & Onboarding
-    if any(word in text for word in ["sign in", "signin", "login", "log in", "sign-in"]):
-        if "invalid" in text or "error" in text:
-            return ("authentication", "signing-in", "error-cases")
-        elif "forgot password" in text or "reset password" in text or "change password" in text:
-            return ("authentication", "signing-in", "password-management")
-        else:
-            return ("authentication", "signing-in")
-    elif any(word in text for word in ["sign up", "signup", "register", "registration", "sign-up"]):
-        if "invalid" in text or "error" in text:
-            return ("authentication", "signing-up", "error-cases")
-        else:
-            return ("authentication", "signing-up")
-    elif "landing page" in text or ("landing" in text and "page" in text):
-        return ("authentication", "landing-page")
-    elif "logout" in text:
-        return ("authentication", "signing-in", "logout")
-    
-    # Organizations and Teams
-    elif any(word in text for word in ["create team", "create a team", "team creation"]):
-        return ("organizations", "create-team")
-    elif "member profile" in text or ("profile" in text and "member" in text):
-        return ("organizations", "member-profile")
-    elif "organization settings" in text or "org settings" in text:
-        return ("organizations", "organization-settings")
-    elif "invite member" in text or ("invite" in text and "member" in text):
-        return ("organizations", "invite-members")
-    
-    # GIDRs (top level)
-    elif "analytics" in text:
-        return ("gidrs", "analytics")
-    elif "mcp server" in text or ("mcp" in text and "server" in text):
-        return ("gidrs", "mcp-server")
-    elif "language selection" in text or ("language" in text and ("change" in text or "select" in text)):
-        return ("gidrs", "language-selection")
-    elif "create gidr" in text:
-        return ("gidrs", "create-gidr")
-    elif "members" in text and "gidr" in text:
-        return ("gidrs", "members")
-    
-    # GIDR Info
-    elif "gidr info" in text or "info popup" in text:
-        return ("gidr", "info", "gidr-info")
-    elif "general settings" in text or "settings drawer" in text:
-        return ("gidr", "info", "general-settings")
-    
-    # Prompts
-    elif "prompt" in text:
-        return ("gidr", "prompts")
-    
-    # Ingestion Settings
-    elif "data source" in text or "data sources" in text:
-        if "file" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "files")
-        elif "url" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "urls")
-        elif "connector" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "connectors")
-        elif "database" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "database")
-        else:
-            return ("gidr", "ingestion-settings", "data-sources")
-    elif "file" in text and ("upload" in text or "ingest" in text or "chunk" in text):
-        return ("gidr", "ingestion-settings", "data-sources", "files")
-    elif "url" in text and ("add" in text or "ingest" in text):
-        return ("gidr", "ingestion-settings", "data-sources", "urls")
-    elif "connector" in text:
-        return ("gidr", "ingestion-settings", "data-sources", "connectors")
-    elif "database" in text:
-        return ("gidr", "ingestion-settings", "data-sources", "database")
-    elif "tag" in text:
-        return ("gidr", "ingestion-settings", "tags")
-    
-    # Design
-    elif "gidget" in text or "gidgets library" in text:
-        return ("gidr", "design", "gidgets-library")
-    elif "studio" in text:
-        return ("gidr", "design", "studio")
-    
-    # Workflows
-    elif "workflow" in text or "work flow" in text:
-        if "node" in text:
-            return ("gidr", "workflows", "nodes")
-        else:
-            return ("gidr", "workflows")
-    elif "node" in text and ("react" in text or "flow" in text):
-        return ("gidr", "workflows", "nodes")
-    
-    # Default
-    return ("uncategorized",)
+# With a budget, a category page over it lists its test cases and links to part pages
+# docs/manual/.../<page>-part-<n>.mdx holding their full text; summaries are cut to this length
+SUMMARY_CHARS = 160
 
-def testcase_to_doc(tc):
-    """Convert a test case to documentation format"""
-    key = tc.get("key", "")
-    name = clean(tc.get("name", "")) or key
-    objective = clean(tc.get("objective", ""))
-    precond = clean(tc.get("precondition", ""))
-    steps = tc.get("steps") or []
+def testcase_to_doc(tc: TestCase, anchor=False):
+    """Convert a test case to documentation format; with `anchor`, links can point at it"""
+    key = tc.key
+    name = tc.title
+    objective = tc.objective
+    precond = tc.precondition
+    steps = tc.steps
     
     doc = []
+    if anchor:
+        doc.append(f'<a id="{testcase_anchor(tc)}" />')
+        doc.append("")
     doc.append(f"## {name}")
     doc.append("")
     if objective:
@@ -134,16 +50,11 @@ def testcase_to_doc(tc):
         doc.append("### Steps")
         doc.append("")
         for i, st in enumerate(steps, start=1):
-            inline = st.get("inline") or {}
-            action = clean(pick(inline, "action", "description", "step", "text")) or clean(pick(st, "action", "description", "step", "text"))
-            data = clean(pick(inline, "data", "testData", "input")) or clean(pick(st, "data", "testData", "input"))
-            expected = clean(pick(inline, "expectedResult", "expected", "result")) or clean(pick(st, "expectedResult", "expected", "result"))
-            
-            doc.append(f"{i}. **{action or 'Action'}**")
-            if data:
-                doc.append(f"   - Data: `{data}`")
-            if expected:
-                doc.append(f"   - Expected: {expected}")
+            doc.append(f"{i}. **{st.action or 'Action'}**")
+            if st.data_text:
+                doc.append(f"   - Data: `{st.data_text}`")
+            if st.expected:
+                doc.append(f"   - Expected: {st.expected}")
             doc.append("")
     
     doc.append(f"*Test case reference: `{key}`*")
@@ -151,8 +62,8 @@ def testcase_to_doc(tc):
     
     return "\n".join(doc)
 
-def create_doc_page(category_path, testcases, base_dir):
-    """Create a documentation page for a category"""
+def doc_page_path(category_path, base_dir):
+    """Return the page path for a category, or None if it has no page"""
     path_parts = list(category_path)
     if path_parts[0] == "uncategorized":
         return  # Skip uncategorized for now
@@ -194,43 +105,75 @@ def create_doc_page(category_path, testcases, base_dir):
     if not doc_path:
         return
     
-    # Create file path
-    file_path = base_dir / "docs" / "manual" / "/".join(doc_path[:-1]) / f"{doc_path[-1]}.mdx"
-    file_path.parent.mkdir(parents=True, exist_ok=True)
+    return base_dir / "docs" / "manual" / "/".join(doc_path[:-1]) / f"{doc_path[-1]}.mdx"
+
+def testcase_anchor(tc: TestCase) -> str:
+    return tc.key.lower()
+
+def testcase_summary(tc: TestCase) -> str:
+    """First line of the objective, shortened to SUMMARY_CHARS"""
+    line = tc.objective.split("\n", 1)[0].strip()
+    if len(line) > SUMMARY_CHARS:
+        # Drop emphasis markers rather than leave one unclosed
+        line = re.sub(r"[*~]", "", line)[:SUMMARY_CHARS].rsplit(" ", 1)[0] + "…"
+    return line
+
+def add_layout_arguments(parser):
+    parser.add_argument("--max-page-bytes", type=int, metavar="BYTES",
+                        help="split category pages whose test cases take more than BYTES into an index and part pages")
+    parser.add_argument("--max-page-testcases", type=int, metavar="N",
+                        help="split category pages with more than N test cases into an index and part pages")
+
+def layout_version(max_bytes=None, max_testcases=None) -> str:
+    """Renderer version of a page; pages are laid out again when a budget changes"""
+    if max_bytes is None and max_testcases is None:
+        return PAGE_VERSION
+    return f"{PAGE_VERSION}:{max_bytes}:{max_testcases}"
+
+def paginate(docs, max_bytes=None, max_testcases=None):
+    """Split `docs` (rendered test cases) into parts within both budgets, in order.
+
+    Returns a single part if they fit on one page. A test case larger than
+    `max_bytes` gets a part of its own.
+    """
+    sizes = [len(doc.encode("utf-8")) for doc in docs]
+    if (max_bytes is None or sum(sizes) <= max_bytes) and (max_testcases is None or len(docs) <= max_testcases):
+        return [list(range(len(docs)))]
+    parts, part, used = [], [], 0
+    for i, size in enumerate(sizes):
+        full = (max_testcases is not None and len(part) >= max_testcases) or \
+            (max_bytes is not None and used + size > max_bytes)
+        if part and full:
+            parts.append(part)
+            part, used = [], 0
+        part.append(i)
+        used += size
+    parts.append(part)
+    return parts
+
+def part_page_path(file_path, number):
+    return file_path.with_name(f"{file_path.stem}-part-{number}.mdx")
+
+def stale_part_pages(file_path, keep=()):
+    """Part pages of `file_path` on disk that are not in `keep`"""
+    prefix = f"{file_path.stem}-part-"
+    return sorted(p for p in file_path.parent.glob(f"{prefix}*.mdx") if p.stem[len(prefix):].isdigit() and p not in keep)
+
+def doc_pages_fresh(manifest, file_path, inputs, version) -> bool:
+    """True if the page of a category and all its part pages are fresh in `manifest`"""
+    return manifest.fresh(file_path, inputs, version) and all(manifest.intact(p) for p in stale_part_pages(file_path))
+
+def splice_doc_page(file_path, auto_block, existing=None, title=None):
+    """Return the page text for `auto_block`; manual content around the AUTO block of `existing` is kept"""
+    # Preserve manual content of an existing page
+    if existing is not None:
+        page = parse_page(existing)
+        if page.has_auto:
+            # Preserve content before and after AUTO markers
+            return page.splice("\n\n" + auto_block)
     
     # Generate title from path
-    title = doc_path[-1].replace("-", " ").title()
-    
-    AUTO_BEGIN = "{/* AUTO:BEGIN */}"
-    AUTO_END = "{/* AUTO:END */}"
-    
-    # Generate auto content
-    auto_content = []
-    if testcases:
-        auto_content.append("## Test Cases")
-        auto_content.append("")
-        auto_content.append("The following test cases cover this functionality:")
-        auto_content.append("")
-        for tc in testcases:
-            auto_content.append(testcase_to_doc(tc))
-    else:
-        auto_content.append("## TODO")
-        auto_content.append("")
-        auto_content.append("_No test cases found for this section. Add documentation here._")
-        auto_content.append("")
-    
-    auto_block = "\n".join(auto_content).strip() + "\n"
-    
-    # Check if file exists and preserve manual content
-    if file_path.exists():
-        txt = file_path.read_text(encoding="utf-8")
-        if AUTO_BEGIN in txt and AUTO_END in txt:
-            # Preserve content before and after AUTO markers
-            pre, rest = txt.split(AUTO_BEGIN, 1)
-            _, post = rest.split(AUTO_END, 1)
-            new_txt = pre + AUTO_BEGIN + "\n\n" + auto_block + AUTO_END + post
-            file_path.write_text(new_txt, encoding="utf-8")
-            return file_path
+    title = title or file_path.stem.replace("-", " ").title()
     
     # New file - create full structure
     content = []
@@ -251,37 +194,151 @@ def create_doc_page(category_path, testcases, base_dir):
     content.append("_Add examples, edge cases, screenshots, caveats, and cross-links here. This section is not overwritten._")
     content.append("")
     
-    file_path.write_text("\n".join(content), encoding="utf-8")
-    return file_path
+    return "\n".join(content)
+
+def render_doc_page(file_path, testcases, existing=None):
+    """Return the page text; manual content around the AUTO block of `existing` is kept"""
+    # Generate auto content
+    auto_content = []
+    if testcases:
+        auto_content.append("## Test Cases")
+        auto_content.append("")
+        auto_content.append("The following test cases cover this functionality:")
+        auto_content.append("")
+        for tc in testcases:
+            auto_content.append(testcase_to_doc(tc))
+    else:
+        auto_content.append("## TODO")
+        auto_content.append("")
+        auto_content.append("_No test cases found for this section. Add documentation here._")
+        auto_content.append("")
+    
+    auto_block = "\n".join(auto_content).strip() + "\n"
+    return splice_doc_page(file_path, auto_block, existing)
+
+def render_doc_pages(file_path, testcases, existing=read_text, max_bytes=None, max_testcases=None):
+    """Return {path: (test cases, text)} for a category, its page first.
+
+    Within both budgets that is the single page render_doc_page() builds.
+    Over either, the page lists each test case with a summary and a link to
+    its anchor on a part page, and the part pages hold the full text.
+    `existing(path)` returns a page's current text, or None.
+    """
+    docs = [testcase_to_doc(tc, anchor=True) for tc in testcases]
+    parts = paginate(docs, max_bytes, max_testcases)
+    if len(parts) == 1:
+        return {file_path: (testcases, render_doc_page(file_path, testcases, existing(file_path)))}
+    
+    title = file_path.stem.replace("-", " ").title()
+    index = []
+    index.append("## Test Cases")
+    index.append("")
+    index.append(f"The following {len(testcases)} test cases cover this functionality. "
+                 f"Their steps are split over {len(parts)} pages.")
+    index.append("")
+    pages = {file_path: None}
+    for number, part in enumerate(parts, start=1):
+        path = part_page_path(file_path, number)
+        url = "/" + page_path(path)
+        part_tcs = [testcases[i] for i in part]
+        index.append(f"### [Part {number}]({url})")
+        index.append("")
+        for tc in part_tcs:
+            summary = testcase_summary(tc)
+            index.append(f"- [**{tc.key}** {tc.title}]({url}#{testcase_anchor(tc)})" + (f": {summary}" if summary else ""))
+        index.append("")
+        
+        auto_content = []
+        auto_content.append(f"## Test Cases ({number} of {len(parts)})")
+        auto_content.append("")
+        auto_content.append(f"Part {number} of the [{title}](/{page_path(file_path)}) test cases.")
+        auto_content.append("")
+        auto_content += [docs[i] for i in part]
+        auto_block = "\n".join(auto_content).strip() + "\n"
+        text = splice_doc_page(path, auto_block, existing(path), f"{title} (Part {number} of {len(parts)})")
+        pages[path] = (part_tcs, text)
+    pages[file_path] = (testcases, splice_doc_page(file_path, "\n".join(index).strip() + "\n", existing(file_path)))
+    return pages
+
+def create_doc_page(category_path, testcases, base_dir, manifest=None, max_bytes=None, max_testcases=None):
+    """Create or update the documentation page for a category.
+
+    Returns the page path and the paths of the files that changed, or None if
+    the category has no page. With a `manifest`, a page whose test cases are
+    unchanged is not rendered again. Over a budget the category is split into
+    part pages (see render_doc_pages); part pages it no longer needs are
+    deleted.
+    """
+    file_path = doc_page_path(category_path, base_dir)
+    if not file_path:
+        return
+    version = layout_version(max_bytes, max_testcases)
+    inputs = page_inputs(testcases) if manifest is not None else None
+    if manifest is not None and doc_pages_fresh(manifest, file_path, inputs, version):
+        return file_path, []
+    pages = render_doc_pages(file_path, testcases, read_text, max_bytes, max_testcases)
+    changed = []
+    for path, (tcs, text) in pages.items():
+        if manifest is not None:
+            manifest.record(path, page_inputs(tcs), version, text)
+        if write_if_changed(path, text):
+            changed.append(path)
+    for path in stale_part_pages(file_path, pages):
+        path.unlink()
+        changed.append(path)
+    return file_path, changed
 
 def main():
-    src = Path("data/zephyr_testcases.json")
-    testcases = json.loads(src.read_text(encoding="utf-8"))
+    parser = argparse.ArgumentParser(description="Generate category documentation pages from the test case snapshot")
+    parser.add_argument("--category", help='only regenerate this category\'s page, e.g. "gidr > workflows"')
+    parser.add_argument("--force", action="store_true", help="render every page, even if its test cases are unchanged")
+    add_layout_arguments(parser)
+    add_classification_arguments(parser)
+    args = parser.parse_args()
+
     base_dir = Path(".")
     
     categorized = defaultdict(list)
     
-    for tc in testcases:
-        category = categorize_testcase(tc)
-        categorized[category].append(tc)
+    if args.category and not (args.similarity or args.multi_label):
+        tcs = list(select_testcases(category=args.category, categorize=categorize_testcase, wrap=TestCase.from_dict))
+        categorized[tuple(args.category.split(" > "))] = tcs
+    else:
+        categorized = categorize(load(iter_testcases()), similarity=similarity_threshold(args),
+                                 multi_label=args.multi_label)
+        if args.category:
+            # These need every test case; keep only the requested page
+            category = tuple(args.category.split(" > "))
+            categorized = {category: categorized.get(category, [])}
     
     # Create documentation pages
+    manifest = PageManifest(force=args.force, postprocess=transform_text)
     created = []
+    unchanged = 0
     for category, tcs in sorted(categorized.items()):
-        path = create_doc_page(category, tcs, base_dir)
-        if path:
+        result = create_doc_page(category, tcs, base_dir, manifest, args.max_page_bytes, args.max_page_testcases)
+        if result and result[1]:
+            path = result[0]
             created.append(path)
-            print(f"Created: {path.relative_to(base_dir)} ({len(tcs)} test cases)")
+            files = f", {len(result[1])} pages changed" if len(result[1]) > 1 else ""
+            print(f"Created: {path.relative_to(base_dir)} ({len(tcs)} test cases{files})")
+        elif result:
+            unchanged += 1
     
-    print(f"\nCreated {len(created)} documentation pages")
+    print(f"\nCreated {len(created)} documentation pages ({unchanged} unchanged)")
+    manifest.save()
+    save_cache(prune=not args.category)
+    if args.category:
+        return
     
     # Save mapping for reference
     mapping = {}
     for category, tcs in categorized.items():
-        mapping[' > '.join(category)] = [tc['key'] for tc in tcs]
+        mapping[' > '.join(category)] = [tc.key for tc in tcs]
     
     output = Path("data/testcase_categories.json")
     output.write_text(json.dumps(mapping, indent=2), encoding="utf-8")
+    save_categories(mapping)
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,30 @@
-import json
+import argparse
 import re
 from pathlib import Path
 from collections import defaultdict
 
-def clean(s: str) -> str:
-    return (s or "").replace("\r\n", "\n").strip()
+import categorization
+import html_markdown
+import step_snippets
+import testcase_model
+from mdx_pages import AUTO_BEGIN, AUTO_END, PageManifest, page_inputs, parse_page, read_text, render_pages, \
+    source_version, write_if_changed
+from snapshot import iter_testcases, select_testcases
+from categorization import ClassificationIndex, categorize_testcase, classify_test_type, save_cache, type_labels
+from categorize_testcases import add_classification_arguments, classification_index, similarity_threshold
+from step_snippets import StepSnippets, snippet_import, snippet_path, write_snippets
+from testcase_model import TestCase, Step, clean, load
+from transform_pages import transform_text
 
-def pick(step: dict, *keys: str) -> str:
-    for k in keys:
-        v = step.get(k)
-        if isinstance(v, str) and v.strip():
-            return v.strip()
-    return ""
-
-def classify_test_type(tc):
-    """Classify test case as happy path, negative, edge, etc."""
-    name = (tc.get("name") or "").lower()
-    objective = (tc.get("objective") or "").lower()
-    text = f"{name} {objective}".lower()
-    
-    if any(word in text for word in ["invalid", "error", "fail", "wrong", "incorrect", "negative"]):
-        return "negative"
-    elif any(word in text for word in ["edge", "boundary", "limit", "extreme"]):
-        return "edge"
-    elif any(word in text for word in ["performance", "perf", "load", "stress"]):
-        return "performance"
-    elif any(word in text for word in ["security", "auth", "permission", "access"]):
-        return "security"
-    else:
-        return "happy"
+# Pages rendered by an older version of this script are rendered again
+PAGE_VERSION = source_version(__file__, testcase_model.__file__, categorization.__file__, html_markdown.__file__,
+                              step_snippets.__file__)
 
 def extract_prerequisites(testcases):
     """Extract common prerequisites from test cases"""
     preconditions = set()
     for tc in testcases:
-        precond = clean(tc.get("precondition", ""))
+        precond = tc.precondition
         if precond:
             preconditions.add(precond)
     return sorted(list(preconditions))
@@ -60,14 +50,12 @@ def normalize_step_action(action: str) -> str:
     # Capitalize first letter
     return action[0].upper() + action[1:] if action else action
 
-def format_step_as_procedure(step, step_num):
+def format_step_as_procedure(step: Step, step_num):
     """Format a step as a readable procedure instead of table row"""
-    inline = step.get("inline") or {}
-    action = clean(pick(inline, "action", "description", "step", "text")) or clean(pick(step, "action", "description", "step", "text"))
-    data = clean(pick(inline, "data", "testData", "input")) or clean(pick(step, "data", "testData", "input"))
-    expected = clean(pick(inline, "expectedResult", "expected", "result")) or clean(pick(step, "expectedResult", "expected", "result"))
+    data = step.data_text
+    expected = step.expected
     
-    action = normalize_step_action(action)
+    action = normalize_step_action(step.action)
     
     lines = []
     lines.append(f"**Step {step_num}: {action}**")
@@ -83,47 +71,25 @@ def format_step_as_procedure(step, step_num):
     
     return "\n".join(lines)
 
-def clean_html(text: str) -> str:
-    """Remove HTML tags from text"""
-    if not text:
-        return ""
-    # Simple HTML tag removal
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'&nbsp;', ' ', text)
-    text = re.sub(r'&lt;', '<', text)
-    text = re.sub(r'&gt;', '>', text)
-    text = re.sub(r'&amp;', '&', text)
-    return clean(text)
-
-def generate_happy_path_procedure(happy_tests):
-    """Generate clean happy path procedure using Mintlify Steps component"""
-    if not happy_tests:
-        return None
-    
-    # Use the first happy path test as the canonical procedure
-    primary_test = happy_tests[0]
-    steps = primary_test.get("steps") or []
-    
-    if not steps:
-        return None
-    
+def procedure_steps(steps, start=1):
+    """Lines of a Mintlify Steps component; numbering starts at `start`"""
     lines = []
     lines.append("<Steps>")
     lines.append("")
     
-    for i, step in enumerate(steps, start=1):
-        inline = step.get("inline") or {}
-        action = clean(pick(inline, "action", "description", "step", "text")) or clean(pick(step, "action", "description", "step", "text"))
-        data = clean_html(pick(inline, "data", "testData", "input")) or clean_html(pick(step, "data", "testData", "input"))
-        expected = clean(pick(inline, "expectedResult", "expected", "result")) or clean(pick(step, "expectedResult", "expected", "result"))
+    for i, step in enumerate(steps, start=start):
+        data = step.data_text
+        expected = step.expected
         
-        action = normalize_step_action(action)
+        action = normalize_step_action(step.action)
         
-        # Extract a short title from action (first 50 chars)
-        title = action[:50] + "..." if len(action) > 50 else action
+        # Extract a short title from the plain-text action (first 50 chars)
+        title = normalize_step_action(step.action_text)
+        title = title[:50] + "..." if len(title) > 50 else title
         title = title.replace('"', "'")  # Avoid quote issues
         
-        lines.append(f'<Step title="{title}">')
+        number = f" stepNumber={{{i}}}" if start > 1 else ""
+        lines.append(f'<Step title="{title}"{number}>')
         lines.append("")
         lines.append(action)
         lines.append("")
@@ -140,7 +106,33 @@ def generate_happy_path_procedure(happy_tests):
         lines.append("")
     
     lines.append("</Steps>")
+    return lines
+
+def procedure_snippet(tc: TestCase, prefix) -> str:
+    """Snippet text for the shared leading steps of `tc`"""
+    return "\n".join(procedure_steps(tc.steps[:prefix.length])) + "\n"
+
+def generate_happy_path_procedure(happy_tests, prefix=None):
+    """Generate clean happy path procedure using Mintlify Steps component.
+
+    The first `prefix.length` steps come from a shared snippet.
+    """
+    if not happy_tests:
+        return None
+    
+    # Use the first happy path test as the canonical procedure
+    primary_test = happy_tests[0]
+    steps = primary_test.steps
     
+    if not steps:
+        return None
+    if not prefix:
+        return "\n".join(procedure_steps(steps))
+    
+    component, import_line = snippet_import("procedure", prefix)
+    lines = [import_line, "", f"<{component} />"]
+    if len(steps) > prefix.length:
+        lines += [""] + procedure_steps(steps[prefix.length:], start=prefix.length + 1)
     return "\n".join(lines)
 
 def generate_errors_section(negative_tests):
@@ -155,15 +147,13 @@ def generate_errors_section(negative_tests):
     lines.append("")
     
     for tc in negative_tests:
-        name = clean(tc.get("name", ""))
-        objective = clean(tc.get("objective", ""))
-        steps = tc.get("steps") or []
+        name = tc.name
+        objective = tc.objective
+        steps = tc.steps
         
         if steps:
             # Extract error condition and expected result
-            last_step = steps[-1] if steps else {}
-            inline = last_step.get("inline") or {}
-            error_msg = clean(pick(inline, "expectedResult", "expected", "result")) or clean(pick(last_step, "expectedResult", "expected", "result"))
+            error_msg = steps[-1].expected
             
             lines.append(f"### {name}")
             lines.append("")
@@ -181,23 +171,31 @@ def generate_errors_section(negative_tests):
             # Extract what causes the error (from steps)
             if len(steps) > 1:
                 error_cause_step = steps[-2] if len(steps) > 1 else steps[0]
-                cause_inline = error_cause_step.get("inline") or {}
-                cause_action = clean(pick(cause_inline, "description", "action")) or clean(pick(error_cause_step, "description", "action"))
+                cause_action = error_cause_step.action
                 if cause_action:
                     lines.append(f"**Cause:** {cause_action}")
                     lines.append("")
             
-            lines.append(f"*Test case reference: `{tc.get('key')}`*")
+            lines.append(f"*Test case reference: `{tc.key}`*")
             lines.append("")
     
     return "\n".join(lines)
 
-def generate_topic_page(topic_name, topic_path, testcases, base_dir):
-    """Generate a feature-level documentation page"""
-    # Classify test cases
-    happy_tests = [tc for tc in testcases if classify_test_type(tc) == "happy"]
-    negative_tests = [tc for tc in testcases if classify_test_type(tc) == "negative"]
-    edge_tests = [tc for tc in testcases if classify_test_type(tc) == "edge"]
+def topic_page_path(topic_path, base_dir):
+    return base_dir / "docs" / "manual" / "/".join(topic_path[:-1]) / f"{topic_path[-1]}.mdx"
+
+def topic_page_lines(topic_path, testcases, index=None, prefixes=None):
+    """Return the lines of a new feature page, or None without test cases.
+
+    `index` is the run's ClassificationIndex; without one, `testcases` are
+    indexed here. `prefixes` maps test case keys to their shared leading
+    steps (StepSnippets.subset), which the procedure imports as a snippet.
+    """
+    if index is None:
+        index = ClassificationIndex(testcases, [topic_path] * len(testcases))
+    happy_tests = index.select(topic_path, "happy")
+    negative_tests = index.select(topic_path, "negative")
+    edge_tests = index.select(topic_path, "edge")
     
     # Get primary happy path test for overview
     primary_test = happy_tests[0] if happy_tests else testcases[0] if testcases else None
@@ -205,16 +203,9 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     if not primary_test:
         return None
     
-    # Create file path
-    file_path = base_dir / "docs" / "manual" / "/".join(topic_path[:-1]) / f"{topic_path[-1]}.mdx"
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    
     # Generate title
     title = topic_path[-1].replace("-", " ").title()
     
-    AUTO_BEGIN = "{/* AUTO:BEGIN */}"
-    AUTO_END = "{/* AUTO:END */}"
-    
     # Build content
     content = []
     content.append("---")
@@ -229,7 +220,7 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     
     # Overview (from objective)
     if primary_test:
-        objective = clean(primary_test.get("objective", ""))
+        objective = primary_test.objective
         if objective:
             content.append("## Overview")
             content.append("")
@@ -246,14 +237,15 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
         content.append("## Prerequisites")
         content.append("")
         for precond in prerequisites:
-            content.append(f"- {precond}")
+            # Indent multi-line preconditions (paragraphs, lists) under their bullet
+            content.append("- " + re.sub(r"\n(?=.)", "\n  ", precond))
         content.append("")
     
     # Happy Path Procedure
     if happy_tests:
         content.append("## Procedure")
         content.append("")
-        procedure = generate_happy_path_procedure(happy_tests)
+        procedure = generate_happy_path_procedure(happy_tests, (prefixes or {}).get(happy_tests[0].key))
         if procedure:
             content.append(procedure)
         else:
@@ -264,9 +256,8 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     if happy_tests:
         all_data = set()
         for tc in happy_tests:
-            for step in tc.get("steps", []):
-                inline = step.get("inline") or {}
-                data = clean_html(pick(inline, "data", "testData", "input")) or clean_html(pick(step, "data", "testData", "input"))
+            for step in tc.steps:
+                data = step.data_text
                 if data and data not in ["_", ""] and len(data) < 200:  # Filter out very long/complex data
                     all_data.add(data)
         
@@ -281,7 +272,9 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     
     # Errors and Troubleshooting
     if negative_tests or edge_tests:
-        errors_section = generate_errors_section(negative_tests + edge_tests)
+        # A test case can be labelled both negative and edge; list it once
+        negative = set(negative_tests)
+        errors_section = generate_errors_section(negative_tests + [tc for tc in edge_tests if tc not in negative])
         if errors_section:
             content.append(errors_section)
     
@@ -298,9 +291,9 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     content.append("")
     content.append("This documentation is derived from the following test cases:")
     content.append("")
-    for tc in sorted(testcases, key=lambda x: x.get("key", "")):
-        key = tc.get("key", "")
-        name = clean(tc.get("name", ""))
+    for tc in sorted(testcases, key=lambda x: x.key):
+        key = tc.key
+        name = tc.name
         test_type = classify_test_type(tc)
         content.append(f"- **{key}**: {name} ({test_type})")
     content.append("")
@@ -311,143 +304,119 @@ def generate_topic_page(topic_name, topic_path, testcases, base_dir):
     content.append("")
     content.append("_Add examples, edge cases, screenshots, caveats, and cross-links here. This section is not overwritten._")
     content.append("")
-    
-    # Check if file exists and preserve manual content
-    if file_path.exists():
-        txt = file_path.read_text(encoding="utf-8")
-        if AUTO_BEGIN in txt and AUTO_END in txt:
-            pre, rest = txt.split(AUTO_BEGIN, 1)
-            _, post = rest.split(AUTO_END, 1)
-            new_txt = pre + AUTO_BEGIN + "\n\n" + "\n".join(content[content.index(AUTO_BEGIN)+1:content.index(AUTO_END)]) + "\n" + AUTO_END + post
-            file_path.write_text(new_txt, encoding="utf-8")
-            return file_path
+    return content
+
+def splice_topic_page(content, existing=None):
+    """Page text for `content` lines, keeping manual content around the AUTO block of `existing`"""
+    # Preserve manual content of an existing page
+    if existing is not None:
+        page = parse_page(existing)
+        if page.has_auto:
+            return page.splice("\n\n" + "\n".join(content[content.index(AUTO_BEGIN)+1:content.index(AUTO_END)]) + "\n")
     
     # New file
-    file_path.write_text("\n".join(content), encoding="utf-8")
-    return file_path
+    return "\n".join(content)
 
-def categorize_testcase(tc):
-    """Categorize test case to topic (same as before)"""
-    name = (tc.get("name") or "").lower()
-    objective = (tc.get("objective") or "").lower()
-    text = f"{name} {objective}".lower()
-    
-    # Authentication & Onboarding
-    if any(word in text for word in ["sign in", "signin", "login", "log in", "sign-in"]):
-        if "invalid" in text or "error" in text:
-            return ("authentication", "signing-in", "error-cases")
-        elif "forgot password" in text or "reset password" in text or "change password" in text:
-            return ("authentication", "signing-in", "password-management")
-        elif "logout" in text:
-            return ("authentication", "signing-in", "logout")
-        else:
-            return ("authentication", "signing-in")
-    elif any(word in text for word in ["sign up", "signup", "register", "registration", "sign-up"]):
-        if "invalid" in text or "error" in text:
-            return ("authentication", "signing-up", "error-cases")
-        else:
-            return ("authentication", "signing-up")
-    elif "landing page" in text or ("landing" in text and "page" in text):
-        return ("authentication", "landing-page")
-    
-    # Organizations and Teams
-    elif any(word in text for word in ["create team", "create a team", "team creation"]):
-        return ("organizations", "create-team")
-    elif "member profile" in text or ("profile" in text and "member" in text):
-        return ("organizations", "member-profile")
-    elif "organization settings" in text or "org settings" in text:
-        return ("organizations", "organization-settings")
-    elif "invite member" in text or ("invite" in text and "member" in text):
-        return ("organizations", "invite-members")
-    
-    # GIDRs (top level)
-    elif "analytics" in text:
-        return ("gidrs", "analytics")
-    elif "mcp server" in text or ("mcp" in text and "server" in text):
-        return ("gidrs", "mcp-server")
-    elif "language selection" in text or ("language" in text and ("change" in text or "select" in text)):
-        return ("gidrs", "language-selection")
-    elif "create gidr" in text:
-        return ("gidrs", "create-gidr")
-    elif "members" in text and "gidr" in text:
-        return ("gidrs", "members")
-    
-    # GIDR Info
-    elif "gidr info" in text or "info popup" in text:
-        return ("gidr", "info", "gidr-info")
-    elif "general settings" in text or "settings drawer" in text:
-        return ("gidr", "info", "general-settings")
-    
-    # Prompts
-    elif "prompt" in text:
-        return ("gidr", "prompts")
-    
-    # Ingestion Settings
-    elif "data source" in text or "data sources" in text:
-        if "file" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "files")
-        elif "url" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "urls")
-        elif "connector" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "connectors")
-        elif "database" in text:
-            return ("gidr", "ingestion-settings", "data-sources", "database")
-        else:
-            return ("gidr", "ingestion-settings", "data-sources")
-    elif "file" in text and ("upload" in text or "ingest" in text or "chunk" in text):
-        return ("gidr", "ingestion-settings", "data-sources", "files")
-    elif "url" in text and ("add" in text or "ingest" in text):
-        return ("gidr", "ingestion-settings", "data-sources", "urls")
-    elif "connector" in text:
-        return ("gidr", "ingestion-settings", "data-sources", "connectors")
-    elif "database" in text:
-        return ("gidr", "ingestion-settings", "data-sources", "database")
-    elif "tag" in text:
-        return ("gidr", "ingestion-settings", "tags")
-    
-    # Design
-    elif "gidget" in text or "gidgets library" in text:
-        return ("gidr", "design", "gidgets-library")
-    elif "studio" in text:
-        return ("gidr", "design", "studio")
-    
-    # Workflows
-    elif "workflow" in text or "work flow" in text:
-        if "node" in text:
-            return ("gidr", "workflows", "nodes")
-        else:
-            return ("gidr", "workflows")
-    elif "node" in text and ("react" in text or "flow" in text):
-        return ("gidr", "workflows", "nodes")
-    
-    return ("uncategorized",)
+def render_topic_page(topic_path, testcases, existing=None, index=None, prefixes=None):
+    """Return the feature page text, or None without test cases.
+
+    Manual content around the AUTO block of `existing` is kept. `index` is
+    the run's ClassificationIndex; without one, `testcases` are indexed here.
+    """
+    content = topic_page_lines(topic_path, testcases, index, prefixes)
+    return None if content is None else splice_topic_page(content, existing)
+
+def topic_page_inputs(testcases, snippets=None):
+    """Manifest inputs of a topic page; test types decide where each test case is listed"""
+    if snippets is not None:
+        return page_inputs(testcases, type_labels, snippets.digest)
+    return page_inputs(testcases, type_labels)
+
+def procedure_test(topic_path, testcases, index=None):
+    """The test case whose steps are the topic page's procedure, or None"""
+    if index is None:
+        index = ClassificationIndex(testcases, [topic_path] * len(testcases))
+    happy_tests = index.select(topic_path, "happy")
+    return happy_tests[0] if happy_tests and happy_tests[0].steps else None
 
 def main():
-    src = Path("data/zephyr_testcases.json")
-    testcases = json.loads(src.read_text(encoding="utf-8"))
+    parser = argparse.ArgumentParser(description="Generate feature-level documentation pages from the test case snapshot")
+    parser.add_argument("--category", help='only regenerate this topic\'s page, e.g. "gidr > workflows"')
+    parser.add_argument("--force", action="store_true", help="render every page, even if its test cases are unchanged")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="render pages in this many worker processes (default: %(default)s)")
+    parser.add_argument("--snippets", action="store_true",
+                        help="render steps shared by several test cases once, as snippets under snippets/generated/")
+    add_classification_arguments(parser)
+    args = parser.parse_args()
+
     base_dir = Path(".")
     
     # Group test cases by topic
     topics = defaultdict(list)
-    for tc in testcases:
-        category = categorize_testcase(tc)
-        if category[0] != "uncategorized":
-            topics[category].append(tc)
+    index = None
+    if args.category and not (args.similarity or args.multi_label):
+        tcs = list(select_testcases(category=args.category, categorize=categorize_testcase, wrap=TestCase.from_dict))
+        if tcs:
+            topics[tuple(args.category.split(" > "))] = tcs
+    else:
+        index = classification_index(load(iter_testcases()), similarity=similarity_threshold(args),
+                                     multi_label=args.multi_label)
+        for category, tcs in index.categorized().items():
+            if category[0] != "uncategorized":
+                topics[category] = tcs
+        if args.category:
+            # These need every test case; keep only the requested topic
+            category = tuple(args.category.split(" > "))
+            topics = {category: topics[category]} if category in topics else {}
     
     # Generate feature-level pages
+    manifest = PageManifest(force=args.force, postprocess=transform_text)
     created = []
-    for topic_path, tcs in sorted(topics.items()):
-        path = generate_topic_page(
-            topic_path[-1],
-            topic_path,
-            tcs,
-            base_dir
-        )
-        if path:
+    unchanged = 0
+    # Shared steps are chosen across the whole snapshot, also when only some pages are rendered
+    snippets = StepSnippets(load(iter_testcases())) if args.snippets else None
+    procedures = {}
+
+    def stale():
+        nonlocal unchanged
+        for topic_path, tcs in sorted(topics.items()):
+            if not tcs:
+                continue
+            prefixes = None
+            if snippets:
+                primary = procedure_test(topic_path, tcs, index)
+                prefixes = snippets.subset([primary] if primary else [])
+                if prefixes:
+                    prefix = prefixes[primary.key]
+                    # Post-processed like the pages, so transform_pages.py leaves the written snippet as is
+                    procedures[prefix] = transform_text(snippet_path("procedure", prefix),
+                                                        procedure_snippet(primary, prefix))
+            path = topic_page_path(topic_path, base_dir)
+            inputs = topic_page_inputs(tcs, snippets)
+            if manifest.fresh(path, inputs, PAGE_VERSION):
+                unchanged += 1
+                continue
+            # Worker processes index their topic's test cases instead of receiving the whole run's index
+            yield (topic_path, tcs, index if args.jobs <= 1 else None, prefixes), (path, inputs, len(tcs))
+
+    # Pages are rendered in parallel with --jobs but written here, in topic order
+    for (path, inputs, count), content in render_pages(topic_page_lines, stale(), args.jobs, chunk_size=1):
+        text = splice_topic_page(content, read_text(path))
+        manifest.record(path, inputs, PAGE_VERSION, text)
+        if write_if_changed(path, text):
             created.append(path)
-            print(f"Created: {path.relative_to(base_dir)} ({len(tcs)} test cases)")
-    
-    print(f"\nGenerated {len(created)} feature-level documentation pages")
+            print(f"Created: {path.relative_to(base_dir)} ({count} test cases)")
+        else:
+            unchanged += 1
+    
+    # A full run removes the snippets no page imports any more
+    written = write_snippets("procedure", procedures, prune=not args.category)
+    print(f"\nGenerated {len(created)} feature-level documentation pages ({unchanged} unchanged)")
+    if snippets:
+        print(f"Shared step snippets: {len(procedures)} ({written} written)")
+    manifest.save()
+    save_cache(prune=not args.category)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,222 @@
+"""Zephyr rich text (HTML) to MDX-safe Markdown.
+
+Zephyr keeps objectives, preconditions and step fields as HTML pasted from the
+browser (`<strong id="isPasted">`, styled spans, `<br>`, `&nbsp;`, lists).
+One html.parser pass converts a fragment: bold, italic and strikethrough become
+Markdown emphasis, links become [text](href), lists become Markdown lists,
+paragraphs and `<br>` become line breaks, and every other tag is dropped while
+its text is kept. Text is escaped so MDX does not read it as JSX or an
+expression. Conversions are memoized, since the same fragments recur across
+steps and test cases.
+
+Three output modes:
+
+    block    multi-line Markdown, for summaries and preconditions
+    inline   a single line, for table cells and list items; breaks are <br />
+    text     plain text without markup, for inline code and parameter lists
+"""
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+
+# Distinct fragments kept per mode
+FRAGMENT_CACHE_SIZE = 1 << 14
+
+BREAK = "<br />"
+
+EMPHASIS = {"strong": "**", "b": "**", "em": "*", "i": "*", "s": "~~", "del": "~~", "strike": "~~"}
+BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "thead", "tbody", "tr"}
+SKIP_TAGS = {"script", "style"}
+
+TAG_RE = re.compile(r"</?[A-Za-z][^>]*>")
+SPACE_RE = re.compile(r"\s+")
+INDENT = "\x00"  # list indentation placeholder, kept apart from collapsible whitespace
+
+def _escape(text: str, mode: str) -> str:
+    if mode == "text":
+        return text
+    text = text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("<", "\\<")
+    return text.replace("|", "\\|") if mode == "inline" else text
+
+class _MarkdownWriter(HTMLParser):
+    def __init__(self, mode: str):
+        super().__init__(convert_charrefs=True)
+        self.mode = mode
+        self.parts = []
+        self.open = []       # [tag, marker or href, index in parts] of emphasis and links not yet closed
+        self.opened = None   # index in parts of the first of the emphasis markers with no text after them yet
+        self.closed = None   # (index in parts, marker, opener index) of the last emphasis closed
+        self.lists = []      # [ordered, next number, width of the current item's bullet] per nesting level
+        self.pending = 0     # break owed before the next content: 1 line, 2 paragraph
+        self.bullet = None   # index in parts of a list bullet with no text after it yet
+        self.skip = 0
+
+    def _break(self, level):
+        # Breaks are deferred so nested blocks (<li><p>) do not stack them; list items stay tight
+        if self.bullet == len(self.parts) - 1:
+            return
+        self.pending = max(self.pending, min(level, 1) if self.lists else level)
+
+    def _emit(self, text):
+        if self.pending and self.parts:
+            if self.mode == "block":
+                self.parts.append("\n" * self.pending)
+            else:
+                self.parts.append(BREAK if self.mode == "inline" else " ")
+        self.pending = 0
+        self.parts.append(text)
+
+    def _open_marker(self, tag, marker):
+        closed = self.closed
+        if closed and closed[0] == len(self.parts) - 1 and closed[1] == marker and not self.pending:
+            # "**a****b**" from adjacent <strong>s: reopen the previous emphasis instead
+            self.parts.pop()
+            self.open.append([tag, marker, closed[2]])
+            return
+        self._emit(marker)
+        self.open.append([tag, marker, len(self.parts) - 1])
+        if self.opened is None:
+            self.opened = len(self.parts) - 1
+
+    def _close_marker(self, marker, start):
+        # Emphasis must hug its text: "**Click **Continue" would not render
+        if start == len(self.parts) - 1:
+            self.parts.pop()
+            if self.opened == start:
+                self.opened = None
+            return
+        trailing = []
+        while self.parts and self.parts[-1] in (BREAK, " "):
+            trailing.insert(0, self.parts.pop())
+        if self.parts and self.parts[-1].endswith(" "):
+            self.parts[-1] = self.parts[-1].rstrip(" ")
+            trailing.insert(0, " ")
+        if not any(c.isalnum() for part in self.parts[start + 1:] for c in part):
+            # Nothing but punctuation or whitespace inside: *'* renders as a stray marker
+            del self.parts[start]
+            self.closed = None
+        else:
+            self.parts.append(marker)
+            self.closed = (len(self.parts) - 1, marker, start)
+        self.parts += trailing
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        elif tag == "br":
+            self._emit(" " if self.mode == "text" else BREAK)
+        elif tag in ("ul", "ol"):
+            self._break(1 if self.lists else 2)
+            self.lists.append([tag == "ol", 1, 0])
+        elif tag == "li":
+            if self.bullet == len(self.parts) - 1:
+                self.parts.pop()  # the previous item was empty
+            self._break(1)
+            if self.mode != "text":
+                level = self.lists[-1] if self.lists else [False, 1, 0]
+                bullet = f"{level[1]}. " if level[0] else "- "
+                level[1] += 1
+                level[2] = len(bullet)
+                # A nested item starts where the text of its parent items does
+                indent = INDENT * sum(parent[2] for parent in self.lists[:-1]) if self.mode == "block" else ""
+                self._emit(indent + bullet)
+                self.bullet = len(self.parts) - 1
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+        elif tag in BLOCK_TAGS:
+            self._break(2)
+        elif self.mode == "text":
+            return
+        elif tag in EMPHASIS:
+            self._open_marker(tag, EMPHASIS[tag])
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self._emit("[")
+            self.open.append([tag, href, len(self.parts) - 1])
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip = max(0, self.skip - 1)
+        elif tag in ("ul", "ol"):
+            if self.lists:
+                self.lists.pop()
+            self._break(1 if self.lists else 2)
+        elif tag in BLOCK_TAGS:
+            self._break(2)
+        elif self.mode == "text":
+            return
+        elif tag in EMPHASIS or tag == "a":
+            # Close anything left open inside this element as well
+            for i in range(len(self.open) - 1, -1, -1):
+                if self.open[i][0] == tag:
+                    for open_tag, value, start in reversed(self.open[i:]):
+                        self._close(open_tag, value, start)
+                    del self.open[i:]
+                    break
+
+    def _close(self, tag, value, start):
+        if tag != "a":
+            self._close_marker(value, start)
+        elif value:
+            if self.parts and self.parts[-1] == "[":
+                self.parts.pop()
+            else:
+                href = value.replace(" ", "%20").replace("(", "%28").replace(")", "%29")
+                self.parts.append(f"]({href})")
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        text = _escape(SPACE_RE.sub(" ", data), self.mode)
+        if not text.strip() and (self.pending or not self.parts):
+            return
+        if text.startswith(" ") and self.opened is not None:
+            # Keep the space outside the emphasis markers that were just opened
+            self.parts.insert(self.opened, " ")
+            for entry in self.open:
+                if entry[2] >= self.opened:
+                    entry[2] += 1
+            self.opened += 1
+            text = text[1:]
+        if text:
+            self.opened = self.bullet = None
+            self._emit(text)
+
+    def result(self) -> str:
+        self.close()
+        for tag, value, start in reversed(self.open):
+            self._close(tag, value, start)
+        text = "".join(self.parts)
+        if self.mode == "block":
+            text = re.sub(r" *\n *", "\n", text)
+            text = re.sub(r"\n{3,}", "\n\n", text).replace(INDENT, " ")
+            return re.sub(r"(?<=\S) {2,}", " ", text).strip()
+        if self.mode == "inline":
+            text = re.sub(r"\s*(?:<br />\s*)+", BREAK, text)
+            text = text.removeprefix(BREAK).removesuffix(BREAK)
+        return re.sub(r" {2,}", " ", text).strip()
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def convert(html: str, mode: str = "block") -> str:
+    """Convert an HTML fragment (or plain text) to Markdown in the given mode"""
+    if not html:
+        return ""
+    if "&" not in html and not TAG_RE.search(html):
+        # Plain text: only escape it, keeping its own line breaks
+        text = re.sub(r"[^\S\n]+", " ", _escape(html.strip(), mode))
+        if mode == "block":
+            return text
+        return SPACE_RE.sub(" ", text) if mode == "text" else re.sub(r"\s*\n\s*", BREAK, text)
+    writer = _MarkdownWriter(mode)
+    writer.feed(html)
+    return writer.result()
+
+def to_markdown(html: str) -> str:
+    return convert(html, "block")
+
+def to_inline_markdown(html: str) -> str:
+    return convert(html, "inline")
+
+def to_text(html: str) -> str:
+    return convert(html, "text")
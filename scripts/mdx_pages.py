@@ -0,0 +1,222 @@
+"""Page parsing, write-if-changed page output and the page dependency manifest.
+
+parse_page() splits a page once into its frontmatter, manual, AUTO and
+trailing regions; generators replace the AUTO block with a single splice.
+read_page() keeps parsed pages cached by mtime and size.
+
+data/.page_manifest.json records, for each generated page, the renderer
+version, the (key, content hash) of every test case it was built from and the
+hashes of its AUTO block as rendered and as post-processed. A page whose
+inputs are unchanged and whose AUTO block on disk is still one of those is not
+rendered again, and a rendered page is only written when its bytes differ from
+the file on disk, so untouched pages keep their mtimes.
+
+render_pages() fans rendering out to a process pool while the calling process
+stays the only writer, handling results in input order.
+"""
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from testcase_model import TestCase
+
+MANIFEST_PATH = Path("data/.page_manifest.json")
+MANIFEST_FORMAT = 2
+
+# Pages rendered per worker task, and tasks queued per worker, with --jobs
+RENDER_CHUNK = 64
+CHUNKS_PER_WORKER = 2
+
+AUTO_BEGIN = "{/* AUTO:BEGIN */}"
+AUTO_END = "{/* AUTO:END */}"
+
+FENCE_RE = re.compile(r"^[ \t]*---[ \t]*$", re.M)
+
+class MdxPage:
+    """A page split into regions by character offsets into `text`.
+
+    frontmatter   text[:manual_start], up to the closing "---" ("" if none)
+    manual        text[manual_start:auto_start], up to and including AUTO_BEGIN
+    auto          text[auto_start:auto_end], between the markers
+    trailing      text[auto_end:], from AUTO_END on
+
+    Without both markers, in order, auto_start and auto_end are None.
+    """
+
+    __slots__ = ("text", "manual_start", "auto_start", "auto_end")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.manual_start = 0
+        self.auto_start = self.auto_end = None
+        first = FENCE_RE.search(text)
+        if first and not text[:first.start()].strip():
+            closing = FENCE_RE.search(text, first.end())
+            if closing:
+                self.manual_start = closing.end()
+        begin = text.find(AUTO_BEGIN, self.manual_start)
+        end = text.find(AUTO_END, begin + len(AUTO_BEGIN)) if begin >= 0 else -1
+        if end >= 0:
+            self.auto_start, self.auto_end = begin + len(AUTO_BEGIN), end
+
+    @property
+    def has_auto(self) -> bool:
+        return self.auto_start is not None
+
+    @property
+    def frontmatter(self) -> str:
+        return self.text[:self.manual_start]
+
+    @property
+    def auto(self):
+        return self.text[self.auto_start:self.auto_end] if self.has_auto else None
+
+    def splice(self, auto: str, frontmatter=None) -> str:
+        """Page text with the AUTO block, and optionally the frontmatter, replaced"""
+        if frontmatter is None:
+            return self.text[:self.auto_start] + auto + self.text[self.auto_end:]
+        return frontmatter + self.text[self.manual_start:self.auto_start] + auto + self.text[self.auto_end:]
+
+def parse_page(text: str) -> MdxPage:
+    return MdxPage(text)
+
+_pages = {}
+
+def read_page(path: Path):
+    """Parsed page at `path`, or None if it does not exist; files are reread only when their mtime or size changed"""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _pages.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    page = MdxPage(path.read_text(encoding="utf-8"))
+    _pages[path] = (stamp, page)
+    return page
+
+def read_text(path: Path):
+    """Current text of the page at `path`, or None"""
+    page = read_page(path)
+    return page.text if page is not None else None
+
+def _digest(value) -> str:
+    canonical = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def testcase_hash(tc: TestCase, *extra) -> str:
+    """Hash of every test case field the page renderers use, plus `extra` (e.g. its test types)"""
+    steps = [[st.action, st.data, st.expected] for st in tc.steps]
+    return _digest([tc.key, tc.name, tc.objective, tc.precondition, steps, *extra])
+
+def page_inputs(testcases, *extra) -> list:
+    """[key, hash] pairs in rendering order; `extra(tc)` adds per-test-case values to each hash"""
+    return [[tc.key, testcase_hash(tc, *(f(tc) for f in extra))] for tc in testcases]
+
+def source_version(*files) -> str:
+    """Hash of a renderer's source files, so changing a generator invalidates its pages"""
+    h = hashlib.sha256()
+    for file in files:
+        h.update(Path(file).read_bytes())
+    return h.hexdigest()[:16]
+
+def auto_hash(text: str):
+    """Hash of the AUTO block of a page, or None if it has none"""
+    auto = MdxPage(text).auto
+    return hashlib.sha256(auto.encode("utf-8")).hexdigest() if auto is not None else None
+
+def _render_chunk(func, args):
+    return [func(*a) for a in args]
+
+def render_pages(func, items, jobs=1, chunk_size=RENDER_CHUNK):
+    """Yield (context, func(*args)) for each (args, context) pair of `items`, in order.
+
+    With `jobs` > 1 the calls run in that many worker processes, `chunk_size`
+    at a time. Only a few chunks per worker are queued, so `items` is consumed
+    lazily; `context` never leaves this process. `func` must be a module-level
+    function.
+    """
+    items = iter(items)
+    if jobs <= 1:
+        for args, context in items:
+            yield context, func(*args)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        queued = deque()
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if chunk:
+                queued.append((chunk, pool.submit(_render_chunk, func, [args for args, _ in chunk])))
+            if queued and (not chunk or len(queued) >= jobs * CHUNKS_PER_WORKER):
+                chunk, future = queued.popleft()
+                yield from zip((context for _, context in chunk), future.result())
+            elif not chunk:
+                return
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Write `text` to `path` unless the file already holds exactly this text"""
+    if read_text(path) == text:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    _pages.pop(path, None)
+    return True
+
+class PageManifest:
+    """Per-page record of what each generated page was rendered from.
+
+    With `force`, no page counts as fresh but new renders are still recorded.
+    `postprocess(path, text)` is what happens to a page after it is written
+    (transform_pages.transform_text), so a post-processed page is not mistaken
+    for one whose AUTO block was edited.
+    """
+
+    def __init__(self, path=MANIFEST_PATH, force=False, postprocess=None):
+        self.path = Path(path)
+        self.force = force
+        self.postprocess = postprocess
+        self.pages = {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            print(f"Warning: Ignoring unreadable page manifest {self.path}: {e}")
+            return
+        if data.get("format") == MANIFEST_FORMAT:
+            self.pages = data.get("pages") or {}
+
+    def intact(self, path: Path) -> bool:
+        """True if the AUTO block of the page on disk is the one recorded for it"""
+        entry = self.pages.get(path.as_posix())
+        page = read_page(path)
+        if not entry or page is None or not page.has_auto:
+            return False
+        return hashlib.sha256(page.auto.encode("utf-8")).hexdigest() in entry["auto"]
+
+    def fresh(self, path: Path, inputs: list, version: str) -> bool:
+        """True if `path` was rendered by renderer `version` from exactly `inputs` and its AUTO block is intact"""
+        if self.force:
+            return False
+        entry = self.pages.get(path.as_posix())
+        return bool(entry) and entry["version"] == version and entry["testcases"] == inputs and self.intact(path)
+
+    def record(self, path: Path, inputs: list, version: str, text: str):
+        hashes = {auto_hash(text)}
+        if self.postprocess is not None:
+            hashes.add(auto_hash(self.postprocess(path, text)))
+        self.pages[path.as_posix()] = {"version": version, "testcases": inputs, "auto": sorted(h for h in hashes if h)}
+
+    def save(self):
+        """Write the manifest atomically, dropping entries for pages that no longer exist"""
+        pages = {p: entry for p, entry in sorted(self.pages.items()) if Path(p).exists()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"format": MANIFEST_FORMAT, "pages": pages}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Regenerate the documentation in one process.
+
+Runs the steps otherwise done by separate scripts (export, categorize, topic
+pages, test case pages, HTML/link/URL post-processing, navigation) as a DAG of
+stages. The snapshot is read once, docs/ is walked once, pages are rendered
+and post-processed in memory and only changed files are written. Pages whose
+test cases are unchanged since the last run (see mdx_pages.py) are not
+rendered at all. Stages whose inputs are ready run concurrently.
+
+    python scripts/regenerate.py                     # feature-level pages
+    python scripts/regenerate.py --generator documentation
+    python scripts/regenerate.py --generator documentation --max-page-testcases 40
+    python scripts/regenerate.py --export --incremental
+    python scripts/regenerate.py --export --projects CP,ABC
+    python scripts/regenerate.py --snippets          # shared steps as snippets/generated/
+    ZEPHYR_PROJECT=CP python scripts/regenerate.py   # only CP's test case pages
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+import categorize_testcases
+import generate_documentation
+import generate_feature_docs
+from build_hierarchical_nav import page_path, update_docs_json
+from categorization import save_cache
+from mdx_pages import PageManifest, page_inputs, read_text, write_if_changed
+from snapshot import SNAPSHOT_JSONL, SnapshotWriter, TeeWriter, iter_testcases, project_keys, set_current, snapshot_path
+from snapshot_db import save_categories
+from step_snippets import StepSnippets, snippet_path, write_snippets
+from testcase_model import TestCase, load
+from transform_pages import DOCS_DIR, MANUAL_DIR, transform_text
+from zephyr_to_mdx import PAGE_VERSION as TESTCASE_PAGE_VERSION, table_snippet, testcase_page, testcase_page_path, \
+    upsert_text
+
+class Stage:
+    """A pipeline step; `func` is called with the results of `deps` as keyword arguments"""
+
+    __slots__ = ("name", "func", "deps")
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+def _timed(stage, inputs):
+    started = time.perf_counter()
+    result = stage.func(**inputs)
+    return result, time.perf_counter() - started
+
+def run_stages(stages, jobs=4):
+    """Run `stages` as soon as their dependencies finish; return (results, timings)"""
+    pending = {stage.name: stage for stage in stages}
+    results, timings, running = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    inputs = {dep: results[dep] for dep in stage.deps}
+                    running[pool.submit(_timed, stage, inputs)] = stage
+            if not running:
+                raise ValueError(f"Stages with unknown or cyclic dependencies: {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name], timings[stage.name] = future.result()
+    return results, timings
+
+class _Collector:
+    """Snapshot writer that keeps the exported test cases for the next stage"""
+
+    def __init__(self):
+        self.testcases = []
+
+    def write(self, record: dict):
+        self.testcases.append(TestCase.from_dict(record))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+def export_stage(concurrency, incremental, projects=None):
+    def run():
+        # zephyr_export needs ZEPHYR_TOKEN at import time
+        import zephyr_export
+        if projects:
+            failures = asyncio.run(zephyr_export.export_projects(projects, concurrency, incremental))
+            if failures:
+                raise SystemExit(f"Failed to export {', '.join(sorted(failures))}; their shards were not written.")
+            return list(load(iter_testcases()))
+        cache = zephyr_export.load_cache() if incremental else None
+        collector = _Collector()
+        writer = TeeWriter([SnapshotWriter(SNAPSHOT_JSONL), collector])
+        try:
+            _, failed = asyncio.run(zephyr_export.export(writer, concurrency, cache))
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            if cache is not None:
+                zephyr_export.save_cache(cache)
+        if failed:
+            writer.abort()
+            raise SystemExit(f"Failed to fetch steps for {len(failed)} test cases; {SNAPSHOT_JSONL} was not written.")
+        writer.close()
+        set_current(SNAPSHOT_JSONL)
+        return collector.testcases
+    return run
+
+def load_stage(export=None):
+    if export is not None:
+        return export
+    if snapshot_path() is None:
+        raise SystemExit("Missing data/zephyr_testcases.jsonl (run Step 3 export first).")
+    return list(load(iter_testcases()))
+
+def categorize_stage(similarity=None, multi_label=False):
+    def run(testcases):
+        index = categorize_testcases.classification_index(testcases, similarity=similarity, multi_label=multi_label)
+        categorized = index.categorized()
+        categorize_testcases.save_mapping(categorized)
+        save_categories(categorize_testcases.category_mapping(categorized))
+        return index
+    return run
+
+def scan_docs():
+    """Current text of every MDX page under docs/"""
+    return {path: read_text(path) for path in DOCS_DIR.rglob("*.mdx")}
+
+def snippets_stage(enabled):
+    def run(testcases):
+        return StepSnippets(testcases) if enabled else None
+    return run
+
+def procedure_tests(categories):
+    """{topic: test case whose steps are its procedure} for the feature pages"""
+    tests = {}
+    for category, tcs in categories.categorized().items():
+        if category[0] != "uncategorized" and tcs:
+            tests[category] = generate_feature_docs.procedure_test(category, tcs, categories)
+    return tests
+
+# Marks a page in the rendered pages that is to be deleted
+REMOVED = object()
+
+def topic_pages_stage(generator, manifest, max_bytes=None, max_testcases=None):
+    """Render the topic pages whose test cases changed.
+
+    Returns {path: text, None if unchanged, or REMOVED}. Documentation pages
+    over a budget are split into part pages (see generate_documentation.py).
+    """
+    base_dir = Path(".")
+    version = generator.PAGE_VERSION if generator is generate_feature_docs else \
+        generate_documentation.layout_version(max_bytes, max_testcases)
+
+    def run(categories, existing, snippets):
+        pages = {}
+        primaries = procedure_tests(categories) if snippets and generator is generate_feature_docs else {}
+        for category, tcs in sorted(categories.categorized().items()):
+            if generator is generate_feature_docs:
+                if category[0] == "uncategorized" or not tcs:
+                    continue
+                path = generate_feature_docs.topic_page_path(category, base_dir)
+                inputs = generate_feature_docs.topic_page_inputs(tcs, snippets)
+                if manifest.fresh(path, inputs, generator.PAGE_VERSION):
+                    pages[path] = None
+                    continue
+                primary = primaries.get(category)
+                prefixes = snippets.subset([primary]) if primary else None
+                text = generate_feature_docs.render_topic_page(category, tcs, existing.get(path), categories, prefixes)
+            else:
+                path = generate_documentation.doc_page_path(category, base_dir)
+                if not path:
+                    continue
+                if generate_documentation.doc_pages_fresh(manifest, path, page_inputs(tcs), version):
+                    pages[path] = None
+                    continue
+                rendered = generate_documentation.render_doc_pages(path, tcs, existing.get, max_bytes, max_testcases)
+                for page, (page_tcs, text) in rendered.items():
+                    manifest.record(page, page_inputs(page_tcs), version, text)
+                    pages[page] = text
+                for page in generate_documentation.stale_part_pages(path, rendered):
+                    pages[page] = REMOVED
+                continue
+            if text is not None:
+                manifest.record(path, inputs, version, text)
+                pages[path] = text
+        return pages
+    return run
+
+def testcase_pages_stage(manifest):
+    """Render the test case pages whose test case changed; returns {path: text or None if unchanged}
+
+    With $ZEPHYR_PROJECT only that project's test case pages are rendered.
+    """
+    def run(testcases, existing, snippets):
+        pages = {}
+        keys = project_keys()
+        for tc in testcases:
+            if not tc.key or keys is not None and tc.key not in keys:
+                continue
+            inputs = page_inputs([tc], snippets.digest) if snippets else page_inputs([tc])
+            if manifest.fresh(testcase_page_path(tc), inputs, TESTCASE_PAGE_VERSION):
+                pages.setdefault(testcase_page_path(tc), None)
+                continue
+            path, frontmatter, auto = testcase_page(tc, prefix=snippets.prefix(tc) if snippets else None)
+            pages[path] = upsert_text(pages.get(path) or existing.get(path), frontmatter, auto)
+            manifest.record(path, inputs, TESTCASE_PAGE_VERSION, pages[path])
+        return pages
+    return run
+
+def snippet_files_stage(generator):
+    """Write the snippets the pages import, removing the ones they no longer do; returns their count"""
+    def run(testcases, categories, snippets):
+        tables, procedures = {}, {}
+        if snippets:
+            for tc in testcases:
+                prefix = snippets.prefix(tc)
+                if prefix:
+                    tables[prefix] = transform_text(snippet_path("table", prefix), table_snippet(tc, prefix))
+            if generator is generate_feature_docs:
+                for tc in filter(None, procedure_tests(categories).values()):
+                    prefix = snippets.prefix(tc)
+                    if prefix:
+                        text = generate_feature_docs.procedure_snippet(tc, prefix)
+                        procedures[prefix] = transform_text(snippet_path("procedure", prefix), text)
+        write_snippets("table", tables, prune=True)
+        if generator is generate_feature_docs:
+            write_snippets("procedure", procedures, prune=True)
+        return len(tables) + len(procedures)
+    return run
+
+def write_pages(topic_pages, testcase_pages, existing):
+    """Post-process every page and write the ones that changed; return their paths"""
+    rendered = {**topic_pages, **testcase_pages}
+    written = []
+    for path in sorted(existing.keys() | rendered.keys()):
+        text = rendered.get(path)
+        if text is REMOVED:
+            path.unlink(missing_ok=True)
+            written.append(path)
+            continue
+        text = transform_text(path, existing.get(path) if text is None else text)
+        if text != existing.get(path) and write_if_changed(path, text):
+            written.append(path)
+    return written
+
+def navigation(topic_pages, existing):
+    manual_pages = {path for path in existing.keys() | topic_pages.keys()
+                    if MANUAL_DIR in path.parents and topic_pages.get(path) is not REMOVED}
+    return update_docs_json([page_path(path) for path in manual_pages])
+
+def build_stages(generator, manifest, export=None, similarity=None, multi_label=False, snippets=False, budget=(None, None)):
+    stages = []
+    if export:
+        stages.append(Stage("export", export))
+        stages.append(Stage("testcases", load_stage, ["export"]))
+    else:
+        stages.append(Stage("testcases", load_stage))
+    stages += [
+        Stage("existing", scan_docs),
+        Stage("categories", categorize_stage(similarity, multi_label), ["testcases"]),
+        Stage("snippets", snippets_stage(snippets), ["testcases"]),
+        Stage("topic_pages", topic_pages_stage(generator, manifest, *budget), ["categories", "existing", "snippets"]),
+        Stage("testcase_pages", testcase_pages_stage(manifest), ["testcases", "existing", "snippets"]),
+        Stage("snippet_files", snippet_files_stage(generator), ["testcases", "categories", "snippets"]),
+        Stage("written", write_pages, ["topic_pages", "testcase_pages", "existing"]),
+        Stage("navigation", navigation, ["topic_pages", "existing"]),
+    ]
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate all documentation pages in a single process")
+    parser.add_argument("--generator", choices=["feature", "documentation"], default="feature",
+                        help="topic pages to build: generate_feature_docs.py or generate_documentation.py (default: %(default)s)")
+    parser.add_argument("--export", action="store_true", help="export the snapshot from Zephyr first")
+    parser.add_argument("--incremental", action="store_true", help="with --export, only refetch changed test cases")
+    parser.add_argument("--concurrency", type=int, default=16, help="with --export, step requests kept in flight")
+    parser.add_argument("--projects", metavar="KEY[,KEY...]",
+                        help="with --export, export these projects concurrently into per-project shards")
+    parser.add_argument("--stage-jobs", type=int, default=4, help="stages run at the same time (default: %(default)s)")
+    parser.add_argument("--force", action="store_true", help="render every page, even if its test cases are unchanged")
+    parser.add_argument("--snippets", action="store_true",
+                        help="render steps shared by several test cases once, as snippets under snippets/generated/")
+    generate_documentation.add_layout_arguments(parser)
+    categorize_testcases.add_classification_arguments(parser)
+    args = parser.parse_args()
+
+    generator = generate_feature_docs if args.generator == "feature" else generate_documentation
+    projects = [p.strip() for p in args.projects.split(",") if p.strip()] if args.projects else None
+    export = export_stage(max(1, args.concurrency), args.incremental, projects) if args.export else None
+
+    started = time.perf_counter()
+    manifest = PageManifest(force=args.force, postprocess=transform_text)
+    stages = build_stages(generator, manifest, export, categorize_testcases.similarity_threshold(args), args.multi_label,
+                          args.snippets, (args.max_page_bytes, args.max_page_testcases))
+    results, timings = run_stages(stages, max(1, args.stage_jobs))
+    manifest.save()
+    save_cache(prune=True)
+
+    print(f"{'stage':<16} {'seconds':>8}")
+    for name, seconds in timings.items():
+        print(f"{name:<16} {seconds:>8.2f}")
+    print(f"\nTest cases: {len(results['testcases'])}")
+    topics, testcases = results["topic_pages"], results["testcase_pages"]
+    print(f"Topic pages: {len(topics)} ({sum(isinstance(t, str) for t in topics.values())} rendered), "
+          f"test case pages: {len(testcases)} ({sum(t is not None for t in testcases.values())} rendered)")
+    if args.snippets:
+        print(f"Shared step snippets: {results['snippet_files']}")
+    nav = results["navigation"]
+    print(f"Wrote {len(results['written'])} changed pages; navigation has {len(nav.groups)} top-level items"
+          + ("" if nav.changed else " (docs.json unchanged)"))
+    for line in nav.report():
+        print(f"  {line}")
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
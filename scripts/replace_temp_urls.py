@@ -1,25 +1,25 @@
 import re
+from itertools import chain
 from pathlib import Path
 
-def replace_urls_in_file(file_path):
+from mdx_pages import read_text, write_if_changed
+from step_snippets import SNIPPETS_DIR
+
+def replace_temp_urls(content):
     """Replace temporary GIDR URLs with app.gidr.ai"""
+    # Pattern to match URLs like https://gidr-*.web.app/...
+    pattern = r'https://gidr-[^/]+\.web\.app(/[^\s`"]*)'
+    
+    def replace_url(match):
+        path = match.group(1)  # Get the path part
+        return f'https://app.gidr.ai{path}'
+    
+    return re.sub(pattern, replace_url, content)
+
+def replace_urls_in_file(file_path):
+    """Replace temporary GIDR URLs in a single file"""
     try:
-        content = file_path.read_text(encoding="utf-8")
-        original = content
-        
-        # Pattern to match URLs like https://gidr-*.web.app/...
-        pattern = r'https://gidr-[^/]+\.web\.app(/[^\s`"]*)'
-        
-        def replace_url(match):
-            path = match.group(1)  # Get the path part
-            return f'https://app.gidr.ai{path}'
-        
-        content = re.sub(pattern, replace_url, content)
-        
-        if content != original:
-            file_path.write_text(content, encoding="utf-8")
-            return True
-        return False
+        return write_if_changed(file_path, replace_temp_urls(read_text(file_path)))
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
         return False
@@ -28,8 +28,8 @@ def main():
     docs_dir = Path("docs")
     replaced_count = 0
     
-    # Find all MDX files
-    for mdx_file in docs_dir.rglob("*.mdx"):
+    # Find all MDX files, including generated snippets pages import
+    for mdx_file in chain(docs_dir.rglob("*.mdx"), SNIPPETS_DIR.rglob("*.mdx")):
         if replace_urls_in_file(mdx_file):
             replaced_count += 1
             print(f"Updated: {mdx_file.relative_to(Path('.'))}")
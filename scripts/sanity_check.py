@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 import json
 import sys
+from itertools import islice
+
+from snapshot import snapshot_path, iter_testcases
 
 # Try to load .env if available (optional)
 try:
@@ -9,15 +12,18 @@ try:
 except (ImportError, PermissionError):
     pass  # Not required for this script
 
+src = snapshot_path()
 try:
-    with open("data/zephyr_testcases.json", "r", encoding="utf-8") as f:
-        d = json.load(f)
-    print("testcases:", len(d))
-    print("first keys:", [x.get("key") for x in d[:5]])
+    if src is None:
+        raise FileNotFoundError
+    first = [x.get("key") for x in islice(iter_testcases(src), 5)]
+    print("snapshot:", src)
+    print("testcases:", sum(1 for _ in iter_testcases(src)))
+    print("first keys:", first)
 except FileNotFoundError:
-    print("Error: data/zephyr_testcases.json not found")
+    print("Error: data/zephyr_testcases.jsonl not found")
     sys.exit(1)
 except json.JSONDecodeError as e:
-    print(f"Error: Invalid JSON in data/zephyr_testcases.json: {e}")
+    print(f"Error: Invalid JSON in {src}: {e}")
     sys.exit(1)
 
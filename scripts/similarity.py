@@ -0,0 +1,164 @@
+"""TF-IDF fallback classifier for test cases the keyword rules leave uncategorized.
+
+Each category gets a centroid built from its keyword-categorized test cases
+and from the hand-written topic pages listed under `topic_pages` in
+data/categorization_rules.json. Uncategorized test cases are scored against
+all centroids with one matrix product per batch and take the nearest
+category when the cosine similarity reaches the threshold.
+
+Needs NumPy (pip install numpy); it runs fully offline. With SciPy installed
+the query batches are sparse matrices, otherwise dense ones of at most
+DENSE_BATCH_CELLS entries.
+"""
+import json
+import re
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+from categorization import RULES_PATH
+from testcase_model import TestCase
+
+DEFAULT_THRESHOLD = 0.4
+BATCH_SIZE = 2048
+DENSE_BATCH_CELLS = 1 << 24  # float32 entries of a dense query batch (64 MiB)
+
+TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n", re.S)
+TAG_RE = re.compile(r"<[^>]+>|\{/\*.*?\*/\}")
+
+def term_counts(text: str) -> Counter:
+    return Counter(TOKEN_RE.findall(text.lower()))
+
+def testcase_text(tc: TestCase) -> str:
+    """Name, objective and step text of a test case"""
+    parts = [tc.name, tc.objective]
+    for st in tc.steps:
+        parts += [st.action, st.expected]
+    return "\n".join(p for p in parts if p)
+
+def page_text(path: Path) -> str:
+    """A topic page's prose without frontmatter and MDX tags"""
+    text = path.read_text(encoding="utf-8")
+    return TAG_RE.sub(" ", FRONTMATTER_RE.sub("", text))
+
+def topic_page_documents(rules_path=RULES_PATH, base_dir=Path(".")):
+    """(category, text) pairs for the hand-written topic pages named in the rule table"""
+    pages = json.loads(Path(rules_path).read_text(encoding="utf-8")).get("topic_pages") or {}
+    for page, category in pages.items():
+        path = base_dir / page
+        if path.exists():
+            yield tuple(category.split(" > ")), page_text(path)
+
+class SimilarityClassifier:
+    """Nearest-centroid classifier over TF-IDF vectors"""
+
+    def __init__(self, vocab: dict, idf, labels: list, centroids, threshold=DEFAULT_THRESHOLD):
+        self.vocab = vocab
+        self.idf = idf
+        self.labels = labels
+        self.centroids = centroids
+        self.threshold = threshold
+
+    @classmethod
+    def fit(cls, documents, threshold=DEFAULT_THRESHOLD) -> "SimilarityClassifier":
+        """Build the model from (category, text) pairs"""
+        if np is None:
+            raise RuntimeError("The similarity classifier needs NumPy (pip install numpy)")
+        categories, counters = [], []
+        for category, text in documents:
+            categories.append(category)
+            counters.append(term_counts(text))
+        labels = sorted(set(categories))
+        if not labels:
+            raise ValueError("No categorized documents to learn from")
+        vocab = {}
+        for counts in counters:
+            for t in counts:
+                vocab.setdefault(t, len(vocab))
+
+        model = cls(vocab, None, labels, None, threshold)
+        rows, cols, _ = model._coo(counters)
+        df = np.bincount(cols, minlength=len(vocab)).astype(np.float32)
+        model.idf = np.log((1 + len(counters)) / (1 + df)) + 1
+
+        rows, cols, weights = model._vectors(counters)
+        label_index = {label: i for i, label in enumerate(labels)}
+        label_ids = np.array([label_index[c] for c in categories])
+        centroids = np.bincount(label_ids[rows] * len(vocab) + cols, weights=weights,
+                                minlength=len(labels) * len(vocab)).reshape(len(labels), len(vocab))
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        model.centroids = (centroids / np.maximum(norms, 1e-12)).astype(np.float32)
+        return model
+
+    def _coo(self, counters):
+        """(rows, cols, counts) of the in-vocabulary terms of each Counter"""
+        vocab = self.vocab
+        known = [[(vocab[t], n) for t, n in counts.items() if t in vocab] for counts in counters]
+        rows = np.repeat(np.arange(len(known)), [len(k) for k in known])
+        flat = np.fromiter(chain.from_iterable(chain.from_iterable(known)), dtype=np.int64)
+        return rows, flat[0::2], flat[1::2]
+
+    def _vectors(self, counters):
+        """Sparse L2-normalized TF-IDF rows (sublinear term frequency) as (rows, cols, weights)"""
+        rows, cols, counts = self._coo(counters)
+        weights = np.log1p(counts) * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(counters)))
+        return rows, cols, weights / np.maximum(norms[rows], 1e-12)
+
+    def _matrix(self, counters):
+        """TF-IDF rows of `counters` as one (len(counters), vocabulary) matrix"""
+        rows, cols, weights = self._vectors(counters)
+        shape = (len(counters), len(self.vocab))
+        if sparse is not None:
+            return sparse.csr_matrix((weights.astype(np.float32), (rows, cols)), shape=shape)
+        matrix = np.zeros(shape, dtype=np.float32)
+        matrix[rows, cols] = weights
+        return matrix
+
+    def predict(self, texts, batch_size=BATCH_SIZE) -> list:
+        """(category or None, score) for each text; None when below the threshold"""
+        texts = list(texts)
+        if sparse is None:
+            batch_size = max(1, min(batch_size, DENSE_BATCH_CELLS // max(1, len(self.vocab))))
+        results = []
+        centroids = self.centroids.T
+        for start in range(0, len(texts), batch_size):
+            counters = [term_counts(t) for t in texts[start:start + batch_size]]
+            # Cosine similarity of every text in the batch to every centroid in one product
+            scores = np.asarray(self._matrix(counters) @ centroids)
+            best = scores.argmax(axis=1)
+            for i, j in enumerate(best):
+                score = float(scores[i, j])
+                results.append((self.labels[j] if score >= self.threshold else None, score))
+        return results
+
+def classify_uncategorized(testcases, labels, default=("uncategorized",), threshold=DEFAULT_THRESHOLD):
+    """Replace `default` labels using a classifier trained on the other test cases.
+
+    `labels` is a list of category tuples parallel to `testcases`; returns a
+    new list and the number of test cases that were reassigned.
+    """
+    documents = [(label, testcase_text(tc)) for tc, label in zip(testcases, labels) if label != default]
+    documents += list(topic_page_documents())
+    pending = [i for i, label in enumerate(labels) if label == default]
+    if not pending or not documents:
+        return list(labels), 0
+    model = SimilarityClassifier.fit(documents, threshold)
+    labels = list(labels)
+    assigned = 0
+    for i, (category, _) in zip(pending, model.predict(testcase_text(testcases[i]) for i in pending)):
+        if category is not None:
+            labels[i] = category
+            assigned += 1
+    return labels, assigned
@@ -0,0 +1,309 @@
+"""Reading and writing the Zephyr test case snapshot.
+
+The exporter streams one test case per line to data/zephyr_testcases.jsonl.
+Readers accept that file, the legacy data/zephyr_testcases.json array or the
+SQLite snapshot (see snapshot_db.py) and yield test cases one at a time, so
+memory stays flat regardless of project size. Every export records the
+snapshot it wrote in data/.current_snapshot.json, and readers use that one.
+
+A multi-project export (zephyr_export.py --projects) writes one shard per
+project to data/projects/<KEY>/zephyr_testcases.jsonl and lists them in
+data/projects/index.json. Reading the index yields every shard in turn.
+Setting ZEPHYR_PROJECT=<KEY> limits the test case pages that are rendered to
+that project (see project_keys); pages and files shared by every project
+(topic pages, the category map) are still built from all shards.
+"""
+import json
+import os
+import textwrap
+from datetime import datetime, timezone
+from pathlib import Path
+
+import snapshot_db
+
+SNAPSHOT_JSONL = Path("data/zephyr_testcases.jsonl")
+SNAPSHOT_JSON = Path("data/zephyr_testcases.json")
+PROJECTS_DIR = Path("data/projects")
+PROJECTS_INDEX = PROJECTS_DIR / "index.json"
+CURRENT_SNAPSHOT = Path("data/.current_snapshot.json")
+
+READ_CHUNK = 1 << 16
+
+def shard_path(project: str) -> Path:
+    """Snapshot shard of one project in a multi-project export"""
+    return PROJECTS_DIR / project / SNAPSHOT_JSONL.name
+
+def load_index(path=PROJECTS_INDEX) -> dict:
+    """{project: {snapshot, testcases, exported}} from the shard index, empty if there is none"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("projects") or {}
+    except FileNotFoundError:
+        return {}
+
+def update_index(counts: dict, path=PROJECTS_INDEX) -> dict:
+    """Record freshly written shards ({project: test case count}) in the index, keeping the others"""
+    projects = load_index(path)
+    exported = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for project, count in counts.items():
+        projects[project] = {"snapshot": shard_path(project).relative_to(PROJECTS_DIR).as_posix(),
+                             "testcases": count, "exported": exported}
+    projects = dict(sorted(projects.items()))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"projects": projects}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    return projects
+
+def set_current(path, pointer=CURRENT_SNAPSHOT):
+    """Record `path` as the current snapshot, the one readers use"""
+    pointer = Path(pointer)
+    pointer.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pointer.with_name(pointer.name + ".tmp")
+    tmp.write_text(json.dumps({"snapshot": Path(path).as_posix()}) + "\n", encoding="utf-8")
+    os.replace(tmp, pointer)
+
+def current_snapshot(pointer=CURRENT_SNAPSHOT):
+    """The snapshot recorded by the last export, or None if there is none or it no longer exists"""
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            path = Path(json.load(f)["snapshot"])
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"Warning: Ignoring unreadable snapshot pointer {pointer}: {e}")
+        return None
+    return path if path.exists() else None
+
+def snapshot_path(project=None):
+    """Return the snapshot to read: the current one (see set_current).
+
+    With a `project`, that project's shard, if it exists. Snapshots exported
+    before the current one was recorded are picked by mtime; the SQLite
+    snapshot is only used once recorded, as storing categories modifies it.
+    """
+    if project:
+        path = shard_path(project)
+        return path if path.exists() else None
+    path = current_snapshot()
+    if path is not None:
+        return path
+    candidates = [p for p in (SNAPSHOT_JSONL, SNAPSHOT_JSON, PROJECTS_INDEX) if p.exists()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime)
+
+def project_keys(project=None):
+    """Keys of the test cases of `project` (default: $ZEPHYR_PROJECT), or None for every project"""
+    project = project or os.getenv("ZEPHYR_PROJECT")
+    if not project:
+        return None
+    path = snapshot_path(project)
+    if path is None:
+        raise FileNotFoundError(shard_path(project))
+    return {tc.get("key") for tc in _iter_jsonl(path)}
+
+def _iter_jsonl(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise json.JSONDecodeError(f"{path}:{line_no}: {e.msg}", e.doc, e.pos) from None
+
+def _iter_json_array(path: Path):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(READ_CHUNK)
+        pos = 0
+        eof = False
+
+        def skip(chars):
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                buf, pos = f.read(READ_CHUNK), 0
+                eof = not buf
+
+        skip(" \t\r\n")
+        if buf[pos:pos + 1] != "[":
+            raise json.JSONDecodeError("Expected a JSON array", buf, pos)
+        pos += 1
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buf):
+                raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+            if buf[pos] == "]":
+                return
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    break
+                except json.JSONDecodeError:
+                    chunk = f.read(READ_CHUNK)
+                    if not chunk:
+                        raise
+                    buf, pos = buf[pos:] + chunk, 0
+            pos = end
+            yield item
+
+def _iter_shards(path: Path):
+    """Yield the test cases of every shard listed in a project index"""
+    for entry in load_index(path).values():
+        yield from iter_testcases(path.parent / entry["snapshot"])
+
+def iter_testcases(path=None):
+    """Yield test case dicts from the snapshot, one at a time"""
+    path = Path(path) if path else snapshot_path()
+    if path is None or not path.exists():
+        raise FileNotFoundError(path or SNAPSHOT_JSONL)
+    if path.name == PROJECTS_INDEX.name:
+        yield from _iter_shards(path)
+    elif path.suffix == ".db":
+        yield from snapshot_db.iter_testcases(path)
+    elif ".jsonl" in path.suffixes:
+        yield from _iter_jsonl(path)
+    else:
+        yield from _iter_json_array(path)
+
+def load_testcases(path=None) -> list:
+    return list(iter_testcases(path))
+
+def select_testcases(category=None, keys=None, categorize=None, wrap=None):
+    """Yield the test cases in `category` ("a > b") or with the given `keys`.
+
+    When the SQLite snapshot is the current one this is an indexed query (for
+    categories, once categorize_testcases.py has stored them); otherwise the
+    snapshot is scanned, categorizing each test case with `categorize`.
+    Records are passed through `wrap` (e.g. TestCase.from_dict) before being
+    categorized and yielded.
+    """
+    wrap = wrap or (lambda tc: tc)
+    path = snapshot_path()
+    if path is not None and path.suffix == ".db":
+        conn = snapshot_db.connect(path)
+        try:
+            if keys is not None:
+                for key in keys:
+                    tc = snapshot_db.get_testcase(conn, key)
+                    if tc is not None:
+                        yield wrap(tc)
+                return
+            if category is not None and snapshot_db.has_categories(conn):
+                for tc in snapshot_db.testcases_by_category(conn, category):
+                    yield wrap(tc)
+                return
+        finally:
+            conn.close()
+
+    wanted = set(keys) if keys is not None else None
+    for tc in iter_testcases(path):
+        if wanted is not None and tc.get("key") not in wanted:
+            continue
+        tc = wrap(tc)
+        if category is not None and " > ".join(categorize(tc)) != category:
+            continue
+        yield tc
+
+class SnapshotWriter:
+    """Stream test cases to a snapshot file.
+
+    Records go to `<path>.partial` as they are written; close() moves the file
+    into place, and abort() leaves any existing snapshot untouched. A `.json`
+    path produces the legacy indented array, anything else JSON Lines.
+
+    With `append=True` a JSON Lines `.partial` file left by an interrupted
+    export is continued; a torn last line is dropped first.
+    """
+
+    def __init__(self, path=SNAPSHOT_JSONL, append=False):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".partial")
+        self.array = self.path.suffix == ".json"
+        self.count = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if append and self.array:
+            raise ValueError("Only JSON Lines snapshots can be appended to")
+        if append and self.tmp_path.exists():
+            self.count = self._repair_partial()
+            self.f = open(self.tmp_path, "a", encoding="utf-8")
+        else:
+            self.f = open(self.tmp_path, "w", encoding="utf-8")
+
+    def _repair_partial(self) -> int:
+        """Truncate the partial file after its last complete line; return the line count"""
+        with open(self.tmp_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            f.truncate(end)
+        return data[:end].count(b"\n")
+
+    def flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def write(self, record: dict):
+        if self.array:
+            item = textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), "  ")
+            self.f.write(("[\n" if self.count == 0 else ",\n") + item)
+        else:
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.array:
+            self.f.write("\n]" if self.count else "[]")
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+class TeeWriter:
+    """Send every record to several snapshot writers; the first one is primary"""
+
+    def __init__(self, writers):
+        self.writers = list(writers)
+        self.primary = self.writers[0]
+
+    @property
+    def count(self):
+        return self.primary.count
+
+    @property
+    def tmp_path(self):
+        return self.primary.tmp_path
+
+    def write(self, record: dict):
+        for w in self.writers:
+            w.write(record)
+
+    def flush(self):
+        for w in self.writers:
+            w.flush()
+
+    def close(self):
+        for w in self.writers:
+            w.close()
+
+    def abort(self):
+        for w in self.writers:
+            w.abort()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Indexed SQLite backend for the Zephyr test case snapshot.
+
+Stores test cases, steps, labels, components and categories with indexes on
+key and category, plus an FTS5 index over name, objective and step text, so
+generators can look up one feature's test cases without loading everything.
+
+    python scripts/snapshot_db.py --build             # from the current snapshot
+    python scripts/snapshot_db.py --category "gidr > workflows"
+    python scripts/snapshot_db.py --search "password reset"
+"""
+import argparse
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+SNAPSHOT_DB = Path("data/zephyr_testcases.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS testcases (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    objective TEXT NOT NULL,
+    precondition TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS testcases_position ON testcases(position);
+CREATE TABLE IF NOT EXISTS steps (
+    key TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    step TEXT NOT NULL,
+    PRIMARY KEY (key, idx)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    key TEXT NOT NULL,
+    label TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_key ON labels(key);
+CREATE INDEX IF NOT EXISTS labels_label ON labels(label);
+CREATE TABLE IF NOT EXISTS components (
+    key TEXT NOT NULL,
+    component TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS components_key ON components(key);
+CREATE TABLE IF NOT EXISTS categories (
+    key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (key, category)
+);
+CREATE INDEX IF NOT EXISTS categories_category ON categories(category);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS testcase_fts USING fts5(key UNINDEXED, name, objective, steps);
+"""
+
+def step_text(step: dict) -> str:
+    """All text fields of a step, inline and top-level, for full-text search"""
+    values = []
+    for source in (step.get("inline") or {}, step):
+        for v in source.values():
+            if isinstance(v, str) and v.strip():
+                values.append(v.strip())
+    return "\n".join(values)
+
+def connect(path=SNAPSHOT_DB) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    try:
+        conn.executescript(FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass  # SQLite built without FTS5; search() reports it
+    return conn
+
+def has_fts(conn) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'testcase_fts'").fetchone()
+    return row is not None
+
+def put_testcase(conn, record: dict, position: int, fts: bool = True):
+    """Insert or replace one exported test case record"""
+    key = record["key"]
+    steps = record.get("steps") or []
+    for table in ("steps", "labels", "components"):
+        conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+    conn.execute(
+        "INSERT OR REPLACE INTO testcases (key, position, name, objective, precondition, record) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (key, position, record.get("name") or "", record.get("objective") or "",
+         record.get("precondition") or "", json.dumps(record, ensure_ascii=False)),
+    )
+    texts = [step_text(st) for st in steps]
+    conn.executemany(
+        "INSERT INTO steps (key, idx, text, step) VALUES (?, ?, ?, ?)",
+        [(key, i, texts[i], json.dumps(st, ensure_ascii=False)) for i, st in enumerate(steps)],
+    )
+    conn.executemany("INSERT INTO labels (key, label) VALUES (?, ?)",
+                     [(key, str(label)) for label in record.get("labels") or []])
+    conn.executemany("INSERT INTO components (key, component) VALUES (?, ?)",
+                     [(key, json.dumps(c, ensure_ascii=False)) for c in record.get("components") or []])
+    if fts:
+        conn.execute("DELETE FROM testcase_fts WHERE key = ?", (key,))
+        conn.execute("INSERT INTO testcase_fts (key, name, objective, steps) VALUES (?, ?, ?, ?)",
+                     (key, record.get("name") or "", record.get("objective") or "", "\n".join(texts)))
+
+def _records(rows):
+    for (record,) in rows:
+        yield json.loads(record)
+
+def iter_testcases(path=SNAPSHOT_DB):
+    """Yield test case records in export order"""
+    conn = sqlite3.connect(str(path))
+    try:
+        yield from _records(conn.execute("SELECT record FROM testcases ORDER BY position"))
+    finally:
+        conn.close()
+
+def get_testcase(conn, key: str):
+    row = conn.execute("SELECT record FROM testcases WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def testcases_by_category(conn, category: str) -> list:
+    """Test cases assigned to `category` ("a > b" form), in export order"""
+    rows = conn.execute(
+        "SELECT t.record FROM categories c JOIN testcases t ON t.key = c.key "
+        "WHERE c.category = ? ORDER BY t.position", (category,))
+    return list(_records(rows))
+
+def has_categories(conn) -> bool:
+    return conn.execute("SELECT 1 FROM categories LIMIT 1").fetchone() is not None
+
+def set_categories(conn, mapping: dict):
+    """Replace all category assignments from a {"a > b": [keys]} mapping"""
+    with conn:
+        conn.execute("DELETE FROM categories")
+        conn.executemany("INSERT OR IGNORE INTO categories (key, category) VALUES (?, ?)",
+                         [(key, category) for category, keys in mapping.items() for key in keys])
+
+def save_categories(mapping: dict, path=None):
+    """Store a category mapping in the SQLite snapshot at `path` (default: the current snapshot).
+
+    Returns the database written, or None when the snapshot is not a database;
+    a database left over from an older export is not touched.
+    """
+    if path is None:
+        from snapshot import snapshot_path
+        path = snapshot_path()
+    if path is None or Path(path).suffix != ".db" or not Path(path).exists():
+        return None
+    conn = connect(path)
+    try:
+        set_categories(conn, mapping)
+    finally:
+        conn.close()
+    return path
+
+def search(conn, query: str, limit: int = 20) -> list:
+    """Full-text search over name, objective and step text; returns (key, name) pairs"""
+    if not has_fts(conn):
+        raise RuntimeError("This SQLite build has no FTS5 support")
+    rows = conn.execute(
+        "SELECT f.key, t.name FROM testcase_fts f JOIN testcases t ON t.key = f.key "
+        "WHERE testcase_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit))
+    return rows.fetchall()
+
+class SnapshotDBWriter:
+    """Write exported test cases into a SQLite snapshot.
+
+    Mirrors SnapshotWriter: rows go to `<path>.partial`, which close() moves
+    into place. Rows are committed when the export checkpoint flushes the
+    writers, after the JSON Lines snapshot, so a partial database never holds
+    rows the JSON Lines partial lacks. With `append=True` an interrupted
+    partial database is reused; see catch_up().
+    """
+
+    def __init__(self, path=SNAPSHOT_DB, append=False):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".partial")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not append and self.tmp_path.exists():
+            self.tmp_path.unlink()
+        self.conn = connect(self.tmp_path)
+        self.fts = has_fts(self.conn)
+        self.count = self.conn.execute("SELECT COUNT(*) FROM testcases").fetchone()[0]
+        self.position = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM testcases").fetchone()[0]
+
+    def write(self, record: dict):
+        put_testcase(self.conn, record, self.position, self.fts)
+        self.position += 1
+        self.count += 1
+
+    def catch_up(self, records) -> int:
+        """Add the `records` the partial database is missing; returns how many.
+
+        On resume the JSON Lines partial may hold rows written after the last
+        commit; the export skips them, so they are copied over from it.
+        """
+        have = {key for (key,) in self.conn.execute("SELECT key FROM testcases")}
+        added = 0
+        for record in records:
+            if record.get("key") not in have:
+                self.write(record)
+                added += 1
+        self.conn.commit()
+        return added
+
+    def flush(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.conn.commit()
+        self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the SQLite test case snapshot")
+    parser.add_argument("--db", default=str(SNAPSHOT_DB))
+    parser.add_argument("--build", action="store_true", help="rebuild the database from the JSON/JSONL snapshot")
+    parser.add_argument("--category", help='list test cases in a category, e.g. "gidr > workflows"')
+    parser.add_argument("--search", help="full-text search over name, objective and steps")
+    args = parser.parse_args()
+
+    if args.build:
+        from snapshot import iter_testcases as iter_snapshot, set_current, snapshot_path
+        src = snapshot_path()
+        if src is None:
+            raise SystemExit("Missing data/zephyr_testcases.jsonl (run Step 3 export first).")
+        writer = SnapshotDBWriter(args.db)
+        for record in iter_snapshot(src):
+            writer.write(record)
+        writer.close()
+        set_current(args.db)
+        print(f"Built {args.db} with {writer.count} test cases from {src}")
+        mapping_path = Path("data/testcase_categories.json")
+        if mapping_path.exists():
+            conn = connect(args.db)
+            set_categories(conn, json.loads(mapping_path.read_text(encoding="utf-8")))
+            conn.close()
+            print(f"Loaded categories from {mapping_path}")
+
+    if not Path(args.db).exists():
+        raise SystemExit(f"Missing {args.db} (run with --build or export with --sqlite).")
+    conn = connect(args.db)
+    if args.category:
+        for tc in testcases_by_category(conn, args.category):
+            print(f"{tc['key']}: {tc['name']}")
+    if args.search:
+        for key, name in search(conn, args.search):
+            print(f"{key}: {name}")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
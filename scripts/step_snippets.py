@@ -0,0 +1,101 @@
+"""Step sequences shared by several test cases, emitted once as Mintlify snippets.
+
+Many test cases start with the same steps (signing in, selecting the
+organization). StepSnippets hashes every leading run of steps and picks, for
+each test case, the longest one that at least MIN_SHARED test cases begin
+with. A page renders those steps by importing a snippet under
+snippets/generated/<kind>/ instead of repeating them; `kind` is the format
+the steps are rendered in ("table" rows on test case pages, "procedure"
+<Step>s on feature pages), so each renderer owns one directory.
+
+    prefix = snippets.prefix(tc)           # None, or the shared leading steps
+    snippet_import("table", prefix)        # (component name, import line)
+    write_snippets("table", {prefix: text for ...}, prune=True)
+"""
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+from mdx_pages import write_if_changed
+
+SNIPPETS_DIR = Path("snippets/generated")
+
+# A snippet covers at least MIN_STEPS steps that at least MIN_SHARED test cases start with
+MIN_STEPS = 2
+MIN_SHARED = 2
+
+COMPONENTS = {"table": "StepTable", "procedure": "StepProcedure"}
+
+class StepPrefix:
+    """The first `length` steps of a test case; `digest` identifies their text"""
+
+    __slots__ = ("digest", "length")
+
+    def __init__(self, digest: str, length: int):
+        self.digest = digest
+        self.length = length
+
+    def __eq__(self, other):
+        return isinstance(other, StepPrefix) and (self.digest, self.length) == (other.digest, other.length)
+
+    def __hash__(self):
+        return hash(self.digest)
+
+def _prefix_digests(steps):
+    """Digest of each leading run of `steps`: the i-th covers steps[:i + 1]"""
+    digests = []
+    h = hashlib.sha256()
+    for st in steps:
+        for field in (st.action, st.data, st.expected):
+            h.update(field.encode("utf-8"))
+            h.update(b"\0")
+        h.update(b"\1")
+        digests.append(h.copy().hexdigest())
+    return digests
+
+class StepSnippets:
+    """Shared leading steps of `testcases`, chosen once for the whole snapshot"""
+
+    def __init__(self, testcases, min_steps=MIN_STEPS, min_shared=MIN_SHARED):
+        digests = {tc.key: _prefix_digests(tc.steps) for tc in testcases if tc.key}
+        counts = Counter(d for ds in digests.values() for d in ds[min_steps - 1:])
+        self.prefixes = {}
+        for key, ds in digests.items():
+            for length in range(len(ds), min_steps - 1, -1):
+                if counts[ds[length - 1]] >= min_shared:
+                    self.prefixes[key] = StepPrefix(ds[length - 1], length)
+                    break
+
+    def prefix(self, tc):
+        """The shared leading steps of `tc`, or None"""
+        return self.prefixes.get(tc.key)
+
+    def digest(self, tc):
+        """Manifest input: pages are rendered again when the steps they import change"""
+        p = self.prefixes.get(tc.key)
+        return p.digest if p else None
+
+    def subset(self, testcases) -> dict:
+        """{key: prefix} for `testcases`, small enough to send to worker processes"""
+        return {tc.key: self.prefixes[tc.key] for tc in testcases if tc.key in self.prefixes}
+
+def snippet_path(kind: str, prefix: StepPrefix) -> Path:
+    return SNIPPETS_DIR / kind / f"{prefix.digest[:16]}.mdx"
+
+def snippet_import(kind: str, prefix: StepPrefix):
+    """Return the component name and the MDX import line for a snippet"""
+    component = f"{COMPONENTS[kind]}{prefix.digest[:12]}"
+    return component, f"import {component} from '/{snippet_path(kind, prefix).as_posix()}';"
+
+def write_snippets(kind: str, snippets: dict, prune=False):
+    """Write {prefix: text} snippets of `kind`; with `prune`, delete the other snippets of that kind.
+
+    Returns the number of files written.
+    """
+    written = sum(write_if_changed(snippet_path(kind, prefix), text) for prefix, text in snippets.items())
+    if prune:
+        keep = {snippet_path(kind, prefix) for prefix in snippets}
+        for path in (SNIPPETS_DIR / kind).glob("*.mdx"):
+            if path not in keep:
+                path.unlink()
+    return written
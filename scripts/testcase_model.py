@@ -0,0 +1,82 @@
+"""Compact test case model shared by the page generators.
+
+Zephyr steps keep their text either under `inline` or at the top level, under
+one of several field names. Step normalizes each step once when a test case is
+loaded, so rendering is a formatting pass over plain attributes. Rich text is
+converted from Zephyr's HTML to MDX-safe Markdown at the same time (see
+html_markdown.py).
+"""
+from html_markdown import to_inline_markdown, to_markdown, to_text
+
+ACTION_KEYS = ("action", "description", "step", "text")
+DATA_KEYS = ("data", "testData", "input")
+EXPECTED_KEYS = ("expectedResult", "expected", "result")
+
+def clean(s: str) -> str:
+    return (s or "").replace("\r\n", "\n").strip()
+
+def pick(step: dict, *keys: str) -> str:
+    for k in keys:
+        v = step.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return ""
+
+def search_text(name, objective) -> str:
+    """Lowercased name + objective, the text categorization rules match against"""
+    return f"{name or ''} {objective or ''}".lower()
+
+class Step:
+    """One test step, normalized from the nested or top-level Zephyr fields"""
+
+    __slots__ = ("action", "data", "expected", "action_text", "data_text")
+
+    def __init__(self, raw: dict):
+        inline = raw.get("inline") or {}
+        action = clean(pick(inline, *ACTION_KEYS) or pick(raw, *ACTION_KEYS))
+        data = clean(pick(inline, *DATA_KEYS) or pick(raw, *DATA_KEYS))
+        # Single-line Markdown: these end up in table cells and list items
+        self.action = to_inline_markdown(action)
+        self.data = to_inline_markdown(data)
+        self.expected = to_inline_markdown(clean(pick(inline, *EXPECTED_KEYS) or pick(raw, *EXPECTED_KEYS)))
+        # Action and test data with HTML markup stripped, for step titles, inline code and parameter lists
+        self.action_text = to_text(action)
+        self.data_text = to_text(data)
+
+class TestCase:
+    """A Zephyr test case with cleaned fields and normalized steps"""
+
+    # `classification` holds (category, test type) once categorization.py has classified it
+    __slots__ = ("key", "name", "objective", "precondition", "labels", "components",
+                 "steps", "title", "search_text", "classification")
+
+    def __init__(self, key, name, objective, precondition, labels, components, steps, search_text):
+        self.key = key
+        self.name = name
+        self.objective = objective
+        self.precondition = precondition
+        self.labels = labels
+        self.components = components
+        self.steps = steps
+        self.title = name or key
+        self.search_text = search_text
+        self.classification = None
+
+    @classmethod
+    def from_dict(cls, tc: dict) -> "TestCase":
+        steps = tc.get("steps") or []
+        return cls(
+            key=str(tc.get("key") or "").strip(),
+            name=clean(tc.get("name")),
+            objective=to_markdown(clean(tc.get("objective"))),
+            precondition=to_markdown(clean(tc.get("precondition"))),
+            labels=tc.get("labels") or [],
+            components=tc.get("components") or [],
+            steps=[Step(st) for st in steps] if isinstance(steps, list) else [],
+            search_text=search_text(tc.get("name"), tc.get("objective")),
+        )
+
+def load(testcases):
+    """Yield TestCase objects for an iterable of snapshot records"""
+    for tc in testcases:
+        yield TestCase.from_dict(tc)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Run the MDX post-processing steps in a single pass over docs/.
+
+Each page is read once, every registered transform that applies to it runs
+over the in-memory text in registration order, and the page is written at
+most once. Directory scanning and page processing share a thread pool. This
+does the work of add_testcase_links.py and replace_temp_urls.py run one after
+the other, over docs/ and the generated snippets pages import. (Zephyr HTML
+is converted when pages are rendered; see html_markdown.py.)
+
+    python scripts/transform_pages.py
+    python scripts/transform_pages.py --only replace_temp_urls --jobs 16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from add_testcase_links import add_testcase_links
+from mdx_pages import read_text, write_if_changed
+from replace_temp_urls import replace_temp_urls
+from step_snippets import SNIPPETS_DIR
+
+DOCS_DIR = Path("docs")
+MANUAL_DIR = DOCS_DIR / "manual"
+PAGE_ROOTS = (DOCS_DIR, SNIPPETS_DIR)
+
+DEFAULT_JOBS = 8
+
+class Transform:
+    """A text rewrite applied to the pages `applies(path)` selects"""
+
+    __slots__ = ("name", "func", "applies")
+
+    def __init__(self, name, func, applies):
+        self.name = name
+        self.func = func
+        self.applies = applies
+
+TRANSFORMS = []
+
+def register(name, func, applies=lambda path: True):
+    """Add a transform; transforms run in the order they were registered"""
+    TRANSFORMS.append(Transform(name, func, applies))
+    return func
+
+register("add_testcase_links", add_testcase_links, lambda path: MANUAL_DIR in path.parents)
+register("replace_temp_urls", replace_temp_urls)
+
+def apply_transforms(path: Path, text: str, transforms=None):
+    """Return the transformed text and the names of the transforms that changed it"""
+    changed = []
+    for t in TRANSFORMS if transforms is None else transforms:
+        if t.applies(path):
+            new_text = t.func(text)
+            if new_text != text:
+                changed.append(t.name)
+                text = new_text
+    return text, changed
+
+def transform_text(path: Path, text: str, transforms=None) -> str:
+    return apply_transforms(path, text, transforms)[0]
+
+def process_page(path: Path, transforms=None):
+    """Transform one page in place; return the names of the transforms that changed it"""
+    try:
+        text, changed = apply_transforms(path, read_text(path), transforms)
+        if changed:
+            write_if_changed(path, text)
+        return changed
+    except Exception as e:
+        print(f"Error processing {path}: {e}")
+        return []
+
+def _scan(directory: Path):
+    files, dirs = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(Path(entry.path))
+            elif entry.name.endswith(".mdx"):
+                files.append(Path(entry.path))
+    return files, dirs
+
+def walk_pages(pool, roots=PAGE_ROOTS):
+    """Yield the .mdx files under the existing `roots`, scanning their directories concurrently on `pool`"""
+    pending = [pool.submit(_scan, root) for root in roots if root.is_dir()]
+    while pending:
+        files, dirs = pending.pop().result()
+        pending += [pool.submit(_scan, d) for d in dirs]
+        yield from files
+
+def transform_pages(roots=PAGE_ROOTS, transforms=None, jobs=DEFAULT_JOBS) -> dict:
+    """Post-process every page under `roots`; return {path: changed transform names} for all pages"""
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {path: pool.submit(process_page, path, transforms) for path in walk_pages(pool, roots)}
+        return {path: futures[path].result() for path in sorted(futures)}
+
+def main():
+    names = [t.name for t in TRANSFORMS]
+    parser = argparse.ArgumentParser(description="Post-process the MDX pages under docs/ in one pass")
+    parser.add_argument("--only", metavar="NAME[,NAME...]", help=f"run only these transforms ({', '.join(names)})")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="threads reading and writing pages (default: %(default)s)")
+    args = parser.parse_args()
+
+    transforms = TRANSFORMS
+    if args.only:
+        wanted = [n.strip() for n in args.only.split(",") if n.strip()]
+        unknown = set(wanted) - set(names)
+        if unknown:
+            parser.error(f"unknown transforms: {', '.join(sorted(unknown))}")
+        transforms = [t for t in TRANSFORMS if t.name in wanted]
+
+    started = time.perf_counter()
+    results = transform_pages(PAGE_ROOTS, transforms, max(1, args.jobs))
+    counts = {t.name: 0 for t in transforms}
+    for path, changed in results.items():
+        if changed:
+            print(f"Updated: {path} ({', '.join(changed)})")
+        for name in changed:
+            counts[name] += 1
+
+    print(f"\nProcessed {len(results)} pages in {time.perf_counter() - started:.1f}s, "
+          f"updated {sum(1 for changed in results.values() if changed)}")
+    for name, count in counts.items():
+        print(f"  {name}: {count} pages")
+
+if __name__ == "__main__":
+    main()
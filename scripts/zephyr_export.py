@@ -1,8 +1,14 @@
-import os, json, time
+import os, json, time, argparse, asyncio, hashlib, random, threading, bisect
+from email.utils import parsedate_to_datetime
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from snapshot import PROJECTS_INDEX, SNAPSHOT_JSONL, SnapshotWriter, TeeWriter, iter_testcases, set_current, shard_path, \
+    update_index
+from snapshot_db import SNAPSHOT_DB, SnapshotDBWriter
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -10,118 +16,528 @@ BASE = os.getenv("ZEPHYR_BASE_URL", "https://api.zephyrscale.smartbear.com/v2")
 TOKEN = os.environ["ZEPHYR_TOKEN"]
 HEADERS = {"Authorization": f"Bearer {TOKEN}", "Accept": "application/json"}
 
-def get(url, params=None):
-    r = requests.get(url, headers=HEADERS, params=params, timeout=60)
-    r.raise_for_status()
-    return r.json()
+# Number of /teststeps requests kept in flight at all times
+DEFAULT_CONCURRENCY = int(os.getenv("ZEPHYR_CONCURRENCY", "16"))
+
+# Project keys exported by --projects when no list is given, e.g. "CP,ABC"
+DEFAULT_PROJECTS = os.getenv("ZEPHYR_PROJECTS", "")
+
+# Per-test-case cache used by --incremental
+CACHE_PATH = "data/.zephyr_cache.json"
+
+# Progress of an interrupted export, used by --resume
+STATE_PATH = "data/.zephyr_export_state.json"
+CHECKPOINT_INTERVAL = 2.0
+
+# Transient responses that are retried with backoff instead of failing the export
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("ZEPHYR_MAX_RETRIES", "6"))
+
+class RateLimiter:
+    """Token bucket shared by every API call, with an adaptive refill rate.
+
+    The rate grows additively after each successful response and is halved on
+    throttling or server errors (AIMD), at most once per `cooldown` seconds so a
+    burst of in-flight requests rejected together only counts once. A
+    Retry-After header pauses all callers until the server says requests may
+    resume.
+    """
+
+    def __init__(self, rate=10.0, min_rate=1.0, max_rate=100.0, increase=0.5, cooldown=1.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.cooldown = cooldown
+        self.last_decrease = float("-inf")
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        capacity = max(1.0, self.rate)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now - self.last_decrease >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.last_decrease = now
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+LIMITER = RateLimiter(rate=float(os.getenv("ZEPHYR_RATE_LIMIT", "20")),
+                      max_rate=float(os.getenv("ZEPHYR_MAX_RATE_LIMIT", "100")))
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-def list_testcases():
-    start_at, max_results = 0, 100
-    all_items = []
+def backoff(attempt: int, base=0.5, cap=30.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def make_session(pool_size: int) -> requests.Session:
+    """Create a keep-alive session whose connection pool fits `pool_size` parallel requests"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get(session, url, params=None):
+    """GET a JSON resource through the shared rate limiter, retrying transient failures"""
+    for attempt in range(MAX_RETRIES + 1):
+        LIMITER.acquire()
+        try:
+            r = session.get(url, params=params, timeout=60)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            LIMITER.on_throttle()
+            delay = backoff(attempt)
+            print(f"    Retrying {url} in {delay:.1f}s after {type(e).__name__}")
+            time.sleep(delay)
+            continue
+
+        if r.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            LIMITER.on_throttle(retry_after)
+            delay = retry_after if retry_after is not None else backoff(attempt)
+            print(f"    Retrying {url} in {delay:.1f}s after HTTP {r.status_code}")
+            time.sleep(delay)
+            continue
+
+        r.raise_for_status()
+        LIMITER.on_success()
+        return r.json()
+
+def iter_testcase_pages(session, start_at=0, max_results=100, project=None):
+    """Yield (start_at, items) for each page of /testcases, optionally of one project"""
     while True:
-        data = get(f"{BASE}/testcases", params={"startAt": start_at, "maxResults": max_results})
+        params = {"startAt": start_at, "maxResults": max_results}
+        if project:
+            params["projectKey"] = project
+        data = get(session, f"{BASE}/testcases", params=params)
         items = data.get("values") or data.get("items") or []
         if not items:
-            break
-        all_items.extend(items)
+            return
+        yield start_at, items
         # Check if this is the last page
         if data.get("isLast", False):
-            break
+            return
         start_at += len(items)
-        time.sleep(0.1)
-    return all_items
 
-def get_steps(testcase_key: str):
+def list_testcases(session):
+    return [tc for _, items in iter_testcase_pages(session) for tc in items]
+
+def get_steps(session, testcase_key: str):
     # Endpoint: /testcases/{key}/teststeps
+    return get(session, f"{BASE}/testcases/{testcase_key}/teststeps")
+
+def normalize_steps(steps_payload) -> list:
+    """Extract the list of steps from a /teststeps response"""
+    if not steps_payload:
+        return []
+    steps = steps_payload.get("values") or steps_payload.get("items") or steps_payload
+    return steps if isinstance(steps, list) else []
+
+def entry_hash(tc: dict) -> str:
+    """Content hash of a /testcases list entry, used to detect changed test cases"""
+    canonical = json.dumps(tc, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def entry_version(tc: dict):
+    """Last-modified marker of a list entry, if the API provides one"""
+    for k in ("version", "updatedOn", "lastModified", "modifiedOn"):
+        if tc.get(k) is not None:
+            return tc[k]
+    return None
+
+def load_cache(path=CACHE_PATH) -> dict:
+    """Load the per-key cache: {key: {hash, version, testcase, steps}}"""
     try:
-        return get(f"{BASE}/testcases/{testcase_key}/teststeps")
-    except Exception as e:
-        print(f"    Warning: Failed to fetch steps for {testcase_key}: {e}")
-        return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Warning: Ignoring unreadable cache {path}: {e}")
+        return {}
+
+def save_cache(cache: dict, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def testcase_record(tc: dict, steps: list) -> dict:
+    """Build the exported record for one test case list entry"""
+    return {
+        "key": tc.get("key"),
+        "name": tc.get("name") or "",
+        "objective": tc.get("objective") or tc.get("description") or "",
+        "precondition": tc.get("precondition") or "",
+        "labels": tc.get("labels") or [],
+        "components": tc.get("components") or [],
+        "steps": steps,
+    }
+
+class OrderedEmitter:
+    """Pass records to a writer in listing order.
+
+    Records arrive in completion order; each one is held only until every
+    earlier record has been written, so output order matches the listing.
+    """
 
-def fetch_steps_batch(testcase_keys, batch_size=10):
-    """Fetch test steps for multiple test cases concurrently"""
-    results = {}
-    
-    def fetch_one(key):
-        return key, get_steps(key)
-    
-    with ThreadPoolExecutor(max_workers=batch_size) as executor:
-        # Submit all tasks
-        future_to_key = {executor.submit(fetch_one, key): key for key in testcase_keys}
-        
-        # Collect results as they complete
-        for future in as_completed(future_to_key):
-            key, steps_payload = future.result()
-            if steps_payload:
-                steps = steps_payload.get("values") or steps_payload.get("items") or steps_payload
-                if not isinstance(steps, list):
-                    steps = []
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = {}
+        self.next_index = 0
+
+        self.first_gap = None
+
+    def put(self, index: int, record):
+        """Queue the record for `index`; None skips that position"""
+        self.pending[index] = record
+        if record is None and (self.first_gap is None or index < self.first_gap):
+            self.first_gap = index
+        while self.next_index in self.pending:
+            record = self.pending.pop(self.next_index)
+            if record is not None:
+                self.writer.write(record)
+            self.next_index += 1
+
+class Checkpoint:
+    """Records export progress in a state file so an interrupted run can resume.
+
+    The state holds the completed keys and the listing cursor: the startAt of
+    the first page that still has test cases without written steps. Writes go
+    to the snapshot first and are flushed before the state is saved, so every
+    key in the state is on disk in the partial snapshot.
+    """
+
+    def __init__(self, writer, output, start_at=0, completed=(), path=STATE_PATH):
+        self.writer = writer
+        self.output = str(output)
+        self.start_at = start_at
+        self.completed = set(completed)
+        self.path = path
+        self.pages = []  # (first listing index, startAt) of each page listed in this run
+        self.last_saved = time.monotonic()
+
+    @classmethod
+    def resume(cls, writer, output, path=STATE_PATH):
+        """Continue from the state file and the keys already in the partial snapshot"""
+        start_at = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("output") == str(output):
+                start_at = state.get("start_at", 0)
+            else:
+                print(f"Warning: {path} belongs to {state.get('output')}; relisting from the start")
+        except FileNotFoundError:
+            pass
+        if not writer.count:
+            return cls(writer, output, path=path)
+        completed = {tc.get("key") for tc in iter_testcases(writer.tmp_path)}
+        return cls(writer, output, start_at, completed, path)
+
+    def add_page(self, first_index: int, start_at: int):
+        self.pages.append((first_index, start_at))
+
+    def write(self, record: dict):
+        self.writer.write(record)
+        self.completed.add(record["key"])
+
+    def save(self, emitter=None):
+        """Persist the completed keys and the cursor of the first incomplete page"""
+        if emitter is not None and self.pages:
+            index = emitter.next_index if emitter.first_gap is None else min(emitter.next_index, emitter.first_gap)
+            pos = bisect.bisect_right([first for first, _ in self.pages], index) - 1
+            self.start_at = self.pages[max(pos, 0)][1]
+        self.writer.flush()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"output": self.output, "start_at": self.start_at,
+                       "completed": sorted(self.completed)}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.last_saved = time.monotonic()
+
+    def maybe_save(self, emitter):
+        if time.monotonic() - self.last_saved >= CHECKPOINT_INTERVAL:
+            self.save(emitter)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+async def export(writer, concurrency=DEFAULT_CONCURRENCY, cache=None, checkpoint=None, project=None):
+    """Export all test cases with their steps to `writer`.
+
+    Listing and step fetching run as one pipeline: each /testcases page is
+    pushed onto a queue as soon as it arrives, and `concurrency` workers drain
+    it, keeping that many /teststeps requests in flight while later pages are
+    still being listed. Each record is written as soon as its steps (and those
+    of every earlier test case) have arrived.
+
+    With a `checkpoint`, listing starts at its cursor, test cases it already
+    completed are skipped, and progress is saved as records are written.
+
+    When `cache` is given, steps are only refetched for test cases whose list
+    entry hash differs from the cached one; `cache` is updated in place.
+    With a `project` key only that project's test cases are listed.
+    Returns the number of test cases listed and a {key: error} dict of step
+    fetches that failed after all retries.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    emitter = OrderedEmitter(checkpoint or writer)
+    skip = checkpoint.completed if checkpoint else set()
+    seen = set(skip)
+    failed = {}
+    progress = {"listed": 0, "queued": 0, "done": 0}
+    tag = f"[{project}] " if project else ""
+
+    async def produce(executor):
+        pages = iter_testcase_pages(session, checkpoint.start_at if checkpoint else 0, project=project)
+        while True:
+            page = await loop.run_in_executor(executor, next, pages, None)
+            if page is None:
+                break
+            if checkpoint:
+                checkpoint.add_page(progress["listed"], page[0])
+            for tc in page[1]:
+                key = tc.get("key")
+                if not key or key in skip:
+                    seen.add(key)
+                    continue
+                index = progress["listed"]
+                progress["listed"] += 1
+                seen.add(key)
+                digest = entry_hash(tc)
+                cached = (cache or {}).get(key) or {}
+                if cache is not None and cached.get("hash") == digest:
+                    emitter.put(index, testcase_record(tc, cached["steps"]))
+                else:
+                    progress["queued"] += 1
+                    queue.put_nowait((index, tc, digest))
+        print(f"{tag}Listed {progress['listed']} test cases, {progress['queued']} need steps.")
+        for _ in range(concurrency):
+            queue.put_nowait(None)
+
+    async def worker(executor):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, tc, digest = item
+            key = tc["key"]
+            try:
+                payload = await loop.run_in_executor(executor, get_steps, session, key)
+            except Exception as e:
+                print(f"    Error: Failed to fetch steps for {key}: {e}")
+                failed[key] = str(e)
+                emitter.put(index, None)
             else:
-                steps = []
-            results[key] = steps
-            # Small delay to avoid overwhelming the API
-            time.sleep(0.05)
-    
-    return results
+                steps = normalize_steps(payload)
+                if cache is not None:
+                    cache[key] = {"hash": digest, "version": entry_version(tc), "testcase": tc, "steps": steps}
+                emitter.put(index, testcase_record(tc, steps))
+            if checkpoint:
+                checkpoint.maybe_save(emitter)
+            progress["done"] += 1
+            if progress["done"] % 50 == 0:
+                print(f"  {tag}Fetched steps for {progress['done']} test cases")
+
+    print(f"{tag}Fetching test cases and steps with {concurrency} requests in flight...")
+    session = make_session(concurrency + 1)
+    try:
+        # One extra thread so listing never waits behind step requests
+        with ThreadPoolExecutor(max_workers=concurrency + 1) as executor:
+            await asyncio.gather(produce(executor), *(worker(executor) for _ in range(concurrency)))
+    finally:
+        session.close()
+        if checkpoint:
+            checkpoint.save(emitter)
+
+    if cache is not None:
+        removed = set(cache) - seen
+        print(f"{tag}{progress['listed'] - progress['queued']} unchanged, {progress['queued']} new or changed, "
+              f"{len(removed)} removed.")
+        for key in removed:
+            del cache[key]
+
+    return progress["listed"], failed
+
+async def export_shard(project, concurrency=DEFAULT_CONCURRENCY, incremental=False, resume=False):
+    """Export one project to its shard; return (test cases written, {key: error}).
+
+    The shard keeps its own --incremental cache and --resume state next to it,
+    and is only replaced when every step fetch succeeded.
+    """
+    path = shard_path(project)
+    cache_path = str(path.parent / os.path.basename(CACHE_PATH))
+    state_path = str(path.parent / os.path.basename(STATE_PATH))
+    cache = load_cache(cache_path) if incremental else None
+    writer = SnapshotWriter(path, append=resume)
+    if resume:
+        checkpoint = Checkpoint.resume(writer, path, state_path)
+    else:
+        checkpoint = Checkpoint(writer, path, path=state_path)
+    try:
+        _, failed = await export(writer, concurrency, cache, checkpoint, project)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if cache is not None:
+            save_cache(cache, cache_path)
+    if failed:
+        writer.abort()
+        return 0, failed
+    writer.close()
+    checkpoint.clear()
+    return writer.count, failed
+
+async def export_projects(projects, concurrency=DEFAULT_CONCURRENCY, incremental=False, resume=False):
+    """Export several projects at once, each to its own shard.
+
+    Every project gets `concurrency` step workers; all of them draw from the
+    shared LIMITER, so together they stay within one request rate budget.
+    Shards that completed are recorded in the project index, which becomes
+    the current snapshot, even when others failed. Returns {project: {key: error}} for the projects that failed,
+    with an exception from listing reported under the "*" key.
+    """
+    results = await asyncio.gather(*(export_shard(p, concurrency, incremental, resume) for p in projects),
+                                   return_exceptions=True)
+    counts, failures = {}, {}
+    for project, result in zip(projects, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            failures[project] = {"*": str(result)}
+        elif result[1]:
+            failures[project] = result[1]
+        else:
+            counts[project] = result[0]
+    if counts:
+        update_index(counts)
+        set_current(PROJECTS_INDEX)
+        for project, count in counts.items():
+            print(f"✓ Exported {count} test cases to {shard_path(project)}")
+    return failures
+
+def parse_projects(value: str) -> list:
+    return list(dict.fromkeys(p.strip() for p in value.split(",") if p.strip()))
 
 def main():
-    print("Fetching test cases...")
-    tcs = list_testcases()
-    print(f"Found {len(tcs)} test cases. Fetching steps in batches...")
-    
-    # Extract test case keys
-    testcase_data = {}
-    keys_to_fetch = []
-    for tc in tcs:
-        key = tc.get("key")
-        if not key:
-            continue
-        keys_to_fetch.append(key)
-        testcase_data[key] = {
-            "name": tc.get("name") or "",
-            "objective": tc.get("objective") or tc.get("description") or "",
-            "precondition": tc.get("precondition") or "",
-            "labels": tc.get("labels") or [],
-            "components": tc.get("components") or [],
-        }
-    
-    # Fetch steps in batches
-    batch_size = 10
-    all_steps = {}
-    total_batches = (len(keys_to_fetch) + batch_size - 1) // batch_size
-    
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min(start_idx + batch_size, len(keys_to_fetch))
-        batch_keys = keys_to_fetch[start_idx:end_idx]
-        
-        print(f"  Fetching steps for batch {batch_num + 1}/{total_batches} ({len(batch_keys)} test cases)...")
-        batch_steps = fetch_steps_batch(batch_keys, batch_size=batch_size)
-        all_steps.update(batch_steps)
-        
-        # Delay between batches to be respectful to the API
-        if batch_num < total_batches - 1:
-            time.sleep(0.2)
-    
-    # Combine test case data with steps
-    out = []
-    for key in keys_to_fetch:
-        out.append({
-            "key": key,
-            "name": testcase_data[key]["name"],
-            "objective": testcase_data[key]["objective"],
-            "precondition": testcase_data[key]["precondition"],
-            "labels": testcase_data[key]["labels"],
-            "components": testcase_data[key]["components"],
-            "steps": all_steps.get(key, [])
-        })
-
-    os.makedirs("data", exist_ok=True)
-    with open("data/zephyr_testcases.json", "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
-    print(f"✓ Exported {len(out)} test cases to data/zephyr_testcases.json")
+    parser = argparse.ArgumentParser(description="Export Zephyr Scale test cases and steps")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of step requests kept in flight (default: %(default)s)")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"only refetch steps for new or changed test cases, using {CACHE_PATH}")
+    parser.add_argument("--output", default=str(SNAPSHOT_JSONL),
+                        help="snapshot to write; a .json path writes the legacy JSON array (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue an interrupted JSON Lines export from {STATE_PATH}")
+    parser.add_argument("--sqlite", nargs="?", const=str(SNAPSHOT_DB), metavar="PATH",
+                        help=f"also write an indexed SQLite snapshot (default path: {SNAPSHOT_DB})")
+    parser.add_argument("--projects", nargs="?", const=DEFAULT_PROJECTS, metavar="KEY[,KEY...]",
+                        help="export these projects concurrently, one shard each under data/projects/ "
+                             "(default list: $ZEPHYR_PROJECTS)")
+    args = parser.parse_args()
+    if args.resume and args.output.endswith(".json"):
+        parser.error("--resume needs a JSON Lines --output")
+
+    started = time.perf_counter()
+    if args.projects is not None:
+        projects = parse_projects(args.projects)
+        if not projects:
+            parser.error("--projects needs project keys (or set ZEPHYR_PROJECTS)")
+        if args.sqlite or args.output != str(SNAPSHOT_JSONL):
+            parser.error("--projects writes its own shards; it cannot be combined with --output or --sqlite")
+        failures = asyncio.run(export_projects(projects, max(1, args.concurrency), args.incremental, args.resume))
+        for project, failed in failures.items():
+            print(f"Error: {project} was not exported ({len(failed)} failures: "
+                  f"{'; '.join(f'{k}: {e}' for k, e in sorted(failed.items())[:5])})")
+        if failures:
+            raise SystemExit(f"{len(failures)} of {len(projects)} projects failed; run again with --resume to retry them.")
+        print(f"✓ Indexed {len(projects)} projects in {PROJECTS_INDEX} in {time.perf_counter() - started:.1f}s")
+        return
+
+    cache = load_cache() if args.incremental else None
+    writer = db = SnapshotWriter(args.output, append=args.resume)
+    if args.sqlite:
+        db = SnapshotDBWriter(args.sqlite, append=args.resume)
+        writer = TeeWriter([writer, db])
+    checkpoint = None
+    if args.output.endswith(".jsonl"):
+        if args.resume:
+            checkpoint = Checkpoint.resume(writer, args.output)
+            if args.sqlite:
+                db.catch_up(iter_testcases(writer.tmp_path))
+            print(f"Resuming: {len(checkpoint.completed)} test cases already exported, listing from startAt={checkpoint.start_at}")
+        else:
+            checkpoint = Checkpoint(writer, args.output)
+    try:
+        _, failed = asyncio.run(export(writer, max(1, args.concurrency), cache, checkpoint))
+    except BaseException:
+        writer.abort()
+        if checkpoint:
+            print(f"Export interrupted; run again with --resume to continue from {STATE_PATH}")
+        raise
+    finally:
+        if cache is not None:
+            save_cache(cache)
+    if failed:
+        writer.abort()
+        hint = " Run again with --resume to retry them." if checkpoint else ""
+        raise SystemExit(f"Failed to fetch steps for {len(failed)} test cases "
+                         f"({', '.join(sorted(failed)[:10])}); {args.output} was not written.{hint}")
+
+    writer.close()
+    # With --sqlite the database is read, for its indexed lookups
+    set_current(args.sqlite or args.output)
+    if checkpoint:
+        checkpoint.clear()
+    print(f"✓ Exported {writer.count} test cases to {args.output} in {time.perf_counter() - started:.1f}s")
 
 if __name__ == "__main__":
     main()
-
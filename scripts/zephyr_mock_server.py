@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Zephyr Scale /testcases and /teststeps endpoints.
+
+Serves recorded fixtures (a snapshot written by zephyr_export.py) or synthetic
+test cases, with injectable latency, jitter, 429 bursts and pagination quirks,
+so the exporter can be exercised and benchmarked without the real API.
+
+    python scripts/zephyr_mock_server.py --synthetic 2000 --latency 40 --jitter 20
+    ZEPHYR_BASE_URL=http://127.0.0.1:8765/v2 ZEPHYR_TOKEN=dummy python scripts/zephyr_export.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+from snapshot import iter_testcases
+
+def synthetic_testcases(count: int, seed: int = 0, project: str = "CP"):
+    """Generate `count` test cases shaped like a Zephyr export"""
+    rng = random.Random(seed)
+    topics = ["sign in", "sign up", "workflow", "data source", "prompt", "studio",
+              "analytics", "mcp server", "member profile", "tags"]
+    testcases = []
+    for i in range(1, count + 1):
+        topic = rng.choice(topics)
+        steps = []
+        for n in range(1, rng.randint(3, 12) + 1):
+            steps.append({
+                "inline": {
+                    "description": f"Step {n}: open the {topic} screen and click <strong>Continue</strong>",
+                    "testData": rng.choice([None, f"value-{i}-{n}", "https://gidr-test1.web.app/en"]),
+                    "expectedResult": f"The {topic} screen should respond to step {n}",
+                    "customFields": {},
+                    "reflectRef": None,
+                },
+                "testCase": None,
+            })
+        testcases.append({
+            "key": f"{project}-T{i}",
+            "name": f"Verify {topic} scenario {i}",
+            "objective": f"Verify that the user can complete the {topic} flow ({i})",
+            "precondition": "User should be signed in",
+            "labels": [],
+            "components": [],
+            "steps": steps,
+        })
+    return testcases
+
+class MockZephyr:
+    """Request handling and fault injection, independent of the HTTP server"""
+
+    def __init__(self, testcases, latency=0.0, jitter=0.0, throttle_every=0, throttle_burst=0,
+                 retry_after=1.0, items_key="values", omit_is_last=False, page_cap=None, seed=0):
+        self.testcases = list(testcases)
+        self.steps = {tc["key"]: tc.get("steps") or [] for tc in self.testcases}
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_every = throttle_every
+        self.throttle_burst = throttle_burst
+        self.retry_after = retry_after
+        self.items_key = items_key
+        self.omit_is_last = omit_is_last
+        self.page_cap = page_cap
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+
+    def _throttle(self) -> bool:
+        """Reject `throttle_burst` consecutive requests after every `throttle_every`"""
+        with self.lock:
+            self.requests += 1
+            if not self.throttle_every:
+                return False
+            if (self.requests - 1) % (self.throttle_every + self.throttle_burst) >= self.throttle_every:
+                self.throttled += 1
+                return True
+            return False
+
+    def _delay(self):
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _page_key(self, start_at: int) -> str:
+        if self.items_key == "mixed":
+            return "values" if (start_at // max(1, self.page_cap or 100)) % 2 == 0 else "items"
+        return self.items_key
+
+    def handle(self, path: str, query: dict):
+        """Return (status, headers, body) for a GET request"""
+        self._delay()
+        if self._throttle():
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, {"message": "Too many requests"}
+
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        if parts[-1] == "testcases":
+            start_at = int(query.get("startAt", ["0"])[0])
+            max_results = int(query.get("maxResults", ["10"])[0])
+            if self.page_cap:
+                max_results = min(max_results, self.page_cap)
+            testcases = self.testcases
+            if "projectKey" in query:
+                prefix = query["projectKey"][0] + "-"
+                testcases = [tc for tc in testcases if tc["key"].startswith(prefix)]
+            page = testcases[start_at:start_at + max_results]
+            body = {
+                "startAt": start_at,
+                "maxResults": max_results,
+                "total": len(testcases),
+                self._page_key(start_at): [{k: v for k, v in tc.items() if k != "steps"} for tc in page],
+            }
+            if not self.omit_is_last:
+                body["isLast"] = start_at + len(page) >= len(testcases)
+            return 200, {}, body
+
+        if len(parts) >= 3 and parts[-1] == "teststeps" and parts[-3] == "testcases":
+            key = parts[-2]
+            if key not in self.steps:
+                return 404, {}, {"message": f"Test case {key} not found"}
+            steps = self.steps[key]
+            return 200, {}, {"startAt": 0, "maxResults": len(steps), "total": len(steps),
+                             "isLast": True, "values": steps}
+
+        return 404, {}, {"message": f"Unknown endpoint {path}"}
+
+def make_server(mock: MockZephyr, host="127.0.0.1", port=8765) -> ThreadingHTTPServer:
+    """Build an HTTP/1.1 keep-alive server for `mock`; port 0 picks a free port"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this, Nagle plus
+        # delayed ACKs add ~40ms to every keep-alive response
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                status, headers, body = 401, {}, {"message": "Missing bearer token"}
+            else:
+                status, headers, body = mock.handle(url.path, parse_qs(url.query))
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def add_mock_arguments(parser):
+    """Fixture and fault-injection options shared with benchmark_export.py"""
+    parser.add_argument("--fixture", help="snapshot to serve (default: data/zephyr_testcases.jsonl or .json)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="serve N generated test cases instead of a fixture")
+    parser.add_argument("--projects", default="CP", metavar="KEY[,KEY...]",
+                        help="with --synthetic, generate N test cases for each of these projects (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.0, help="base response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency of up to this many ms")
+    parser.add_argument("--throttle-every", type=int, default=0, metavar="N",
+                        help="answer 429 after every N requests (0 disables throttling)")
+    parser.add_argument("--throttle-burst", type=int, default=5, metavar="M", help="length of each 429 burst")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--items-key", choices=["values", "items", "mixed"], default="values",
+                        help="list key used in /testcases pages")
+    parser.add_argument("--omit-is-last", action="store_true", help="never send isLast; paging ends on an empty page")
+    parser.add_argument("--page-cap", type=int, help="return at most this many test cases per page")
+    parser.add_argument("--seed", type=int, default=0)
+
+def mock_from_args(args) -> MockZephyr:
+    if args.synthetic:
+        testcases = [tc for i, project in enumerate(args.projects.split(","))
+                     for tc in synthetic_testcases(args.synthetic, args.seed + i, project.strip())]
+    else:
+        testcases = list(iter_testcases(args.fixture))
+    return MockZephyr(
+        testcases,
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        throttle_every=args.throttle_every,
+        throttle_burst=args.throttle_burst if args.throttle_every else 0,
+        retry_after=args.retry_after,
+        items_key=args.items_key,
+        omit_is_last=args.omit_is_last,
+        page_cap=args.page_cap,
+        seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Zephyr Scale API")
+    add_mock_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server = make_server(mock, args.host, args.port)
+    print(f"Serving {len(mock.testcases)} test cases at http://{args.host}:{server.server_port}/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Handled {mock.requests} requests ({mock.throttled} throttled)")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,48 @@
-import json, os, re
+import argparse, re
 from pathlib import Path
 
-AUTO_BEGIN = "{/* AUTO:BEGIN */}"
-AUTO_END = "{/* AUTO:END */}"
+import html_markdown
+import step_snippets
+import testcase_model
+from mdx_pages import AUTO_BEGIN, AUTO_END, PageManifest, page_inputs, parse_page, read_text, render_pages, \
+    source_version, write_if_changed
+from snapshot import snapshot_path, iter_testcases, project_keys, select_testcases
+from step_snippets import StepSnippets, snippet_import, snippet_path, write_snippets
+from testcase_model import TestCase, load
+from transform_pages import transform_text
+
+OUT_DIR = Path("docs/generated/testcases")
+
+# Pages rendered by an older version of this script are rendered again
+PAGE_VERSION = source_version(__file__, testcase_model.__file__, html_markdown.__file__, step_snippets.__file__)
+
+STEP_TABLE_HEADER = ["| # | Action | Data | Expected |", "|---:|---|---|---|"]
 
 def slug(s: str) -> str:
     s = (s or "").strip()
     s = re.sub(r"[^A-Za-z0-9._-]+", "-", s)
     return s.strip("-") or "unknown"
 
-def clean(s: str) -> str:
-    return (s or "").replace("\r\n", "\n").strip()
+def step_rows(steps, start=1):
+    return [f"| {i} | {st.action or '_'} | {st.data or '_'} | {st.expected or '_'} |"
+            for i, st in enumerate(steps, start=start)]
 
-def pick(step: dict, *keys: str) -> str:
-    for k in keys:
-        v = step.get(k)
-        if isinstance(v, str) and v.strip():
-            return v.strip()
-    return ""
+def table_snippet(tc: TestCase, prefix) -> str:
+    """Snippet text for the shared leading steps of `tc`"""
+    return "\n".join(STEP_TABLE_HEADER + step_rows(tc.steps[:prefix.length])) + "\n"
 
-def render_auto(tc: dict) -> str:
-    key = tc.get("key", "")
-    name = clean(tc.get("name", "")) or key
-    objective = clean(tc.get("objective", ""))
-    precond = clean(tc.get("precondition", ""))
-    steps = tc.get("steps") or []
+def render_auto(tc: TestCase, prefix=None) -> str:
+    """AUTO block of a test case page; the first `prefix.length` steps come from a shared snippet"""
+    key = tc.key
+    objective = tc.objective
+    precond = tc.precondition
+    steps = tc.steps
 
     out = []
+    if prefix:
+        component, import_line = snippet_import("table", prefix)
+        out.append(import_line)
+        out.append("")
     out.append("## Summary")
     out.append(objective if objective else "_No objective provided in Zephyr._")
     out.append("")
@@ -35,63 +51,48 @@ def render_auto(tc: dict) -> str:
     out.append("")
     out.append("## Steps")
     out.append("")
-    out.append("| # | Action | Data | Expected |")
-    out.append("|---:|---|---|---|")
-
-    if not isinstance(steps, list) or len(steps) == 0:
+    if prefix:
+        out.append(f"<{component} />")
+        out.append("")
+        if len(steps) > prefix.length:
+            out += STEP_TABLE_HEADER + step_rows(steps[prefix.length:], start=prefix.length + 1)
+    elif not steps:
+        out += STEP_TABLE_HEADER
         out.append("| 1 | _No steps found._ | _ | _ |")
     else:
-        for i, st in enumerate(steps, start=1):
-            # Handle nested structure: st['inline']['description'] etc.
-            inline = st.get("inline") or {}
-            # Try nested first, then top-level
-            action = clean(pick(inline, "action", "description", "step", "text")) or clean(pick(st, "action", "description", "step", "text"))
-            data = clean(pick(inline, "data", "testData", "input")) or clean(pick(st, "data", "testData", "input"))
-            expected = clean(pick(inline, "expectedResult", "expected", "result")) or clean(pick(st, "expectedResult", "expected", "result"))
-            out.append(f"| {i} | {action or '_'} | {data or '_'} | {expected or '_'} |")
+        out += STEP_TABLE_HEADER + step_rows(steps)
 
     out.append("")
     out.append(f"**Zephyr key:** `{key}`")
     out.append("")
     return "\n".join(out).strip() + "\n"
 
-def upsert_page(path: Path, frontmatter: str, auto_block: str):
-    if path.exists():
-        txt = path.read_text(encoding="utf-8")
-        if AUTO_BEGIN in txt and AUTO_END in txt:
-            # Update frontmatter if it exists
-            if txt.strip().startswith("---"):
-                # Find where frontmatter ends (second ---)
-                lines = txt.split("\n")
-                frontmatter_end = 0
-                dash_count = 0
-                for i, line in enumerate(lines):
-                    if line.strip() == "---":
-                        dash_count += 1
-                        if dash_count == 2:
-                            frontmatter_end = i + 1
-                            break
-                
-                if frontmatter_end > 0:
-                    # Extract manual section (between frontmatter and AUTO_BEGIN)
-                    manual_section = "\n".join(lines[frontmatter_end:])
-                    if AUTO_BEGIN in manual_section:
-                        manual_part, auto_rest = manual_section.split(AUTO_BEGIN, 1)
-                        _, post = auto_rest.split(AUTO_END, 1)
-                        # Reconstruct with new frontmatter
-                        new_txt = frontmatter + "\n\n" + manual_part + AUTO_BEGIN + "\n\n" + auto_block + "\n" + AUTO_END + post
-                        path.write_text(new_txt, encoding="utf-8")
-                        return
-            
-            # Fallback: just update auto section
-            pre, rest = txt.split(AUTO_BEGIN, 1)
-            _, post = rest.split(AUTO_END, 1)
-            new_txt = pre + AUTO_BEGIN + "\n\n" + auto_block + "\n" + AUTO_END + post
-            path.write_text(new_txt, encoding="utf-8")
-            return
+def testcase_page_path(tc: TestCase, out_dir: Path = OUT_DIR) -> Path:
+    return out_dir / f"{slug(tc.key)}.mdx"
+
+def testcase_page(tc: TestCase, out_dir: Path = OUT_DIR, prefix=None):
+    """Return (path, frontmatter, auto block) for a test case's page; see render_auto for `prefix`"""
+    title = tc.title
+    # Escape quotes in title for YAML frontmatter
+    title_escaped = title.replace('"', '\\"')
+    frontmatter = (
+        "---\n"
+        f'title: "{title_escaped}"\n'
+        f'description: "Auto-generated from Zephyr Scale test case {tc.key}"\n'
+        "---"
+    )
+    return testcase_page_path(tc, out_dir), frontmatter, render_auto(tc, prefix)
+
+def upsert_text(txt, frontmatter: str, auto_block: str) -> str:
+    """Return the page text for `auto_block`; `txt` is the current page, if any"""
+    if txt is not None:
+        page = parse_page(txt)
+        if page.has_auto:
+            # Replace the frontmatter (if the page has one) and the AUTO block; keep the manual section as is
+            return page.splice("\n\n" + auto_block + "\n", frontmatter if page.frontmatter else None)
 
     # New file scaffold: manual section + auto block
-    content = (
+    return (
         frontmatter
         + "\n\n"
         + "## Notes (manual)\n\n"
@@ -100,45 +101,73 @@ def upsert_page(path: Path, frontmatter: str, auto_block: str):
         + auto_block + "\n"
         + AUTO_END + "\n"
     )
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(content, encoding="utf-8")
 
-def main():
-    src = Path("data/zephyr_testcases.json")
-    if not src.exists():
-        raise SystemExit("Missing data/zephyr_testcases.json (run Step 3 export first).")
+def upsert_page(path: Path, frontmatter: str, auto_block: str):
+    """Update the page; return its text and whether the file changed"""
+    text = upsert_text(read_text(path), frontmatter, auto_block)
+    return text, write_if_changed(path, text)
 
-    testcases = json.loads(src.read_text(encoding="utf-8"))
-    out_dir = Path("docs/generated/testcases")
+def main():
+    parser = argparse.ArgumentParser(description="Generate one MDX page per Zephyr test case")
+    parser.add_argument("--key", action="append", help="only regenerate this test case's page (repeatable)")
+    parser.add_argument("--force", action="store_true", help="render every page, even if its test case is unchanged")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="render pages in this many worker processes (default: %(default)s)")
+    parser.add_argument("--snippets", action="store_true",
+                        help="render steps shared by several test cases once, as snippets under snippets/generated/")
+    args = parser.parse_args()
+
+    src = snapshot_path()
+    if src is None:
+        raise SystemExit("Missing data/zephyr_testcases.jsonl (run Step 3 export first).")
 
     created = 0
     updated = 0
-
-    for tc in testcases:
-        key = str(tc.get("key") or "").strip()
-        if not key:
-            continue
-
-        title = clean(tc.get("name")) or key
-        # Escape quotes in title for YAML frontmatter
-        title_escaped = title.replace('"', '\\"')
-        frontmatter = (
-            "---\n"
-            f'title: "{title_escaped}"\n'
-            f'description: "Auto-generated from Zephyr Scale test case {key}"\n'
-            "---"
-        )
-
-        auto = render_auto(tc)
-        path = out_dir / f"{slug(key)}.mdx"
+    unchanged = 0
+
+    manifest = PageManifest(force=args.force, postprocess=transform_text)
+    testcases = select_testcases(keys=args.key) if args.key else iter_testcases(src)
+    # With $ZEPHYR_PROJECT only that project's pages are rendered; the snippets still cover every project
+    keys = project_keys()
+    # Shared steps are chosen across the whole snapshot, also when only some pages are rendered
+    snippets = StepSnippets(load(iter_testcases(src))) if args.snippets else None
+    tables = {}
+
+    def stale():
+        nonlocal unchanged
+        for tc in load(testcases):
+            if not tc.key:
+                continue
+            prefix = snippets.prefix(tc) if snippets else None
+            if prefix:
+                # Post-processed like the pages, so transform_pages.py leaves the written snippet as is
+                tables[prefix] = transform_text(snippet_path("table", prefix), table_snippet(tc, prefix))
+            if keys is not None and tc.key not in keys:
+                continue
+            inputs = page_inputs([tc], snippets.digest) if snippets else page_inputs([tc])
+            if manifest.fresh(testcase_page_path(tc), inputs, PAGE_VERSION):
+                unchanged += 1
+                continue
+            yield (tc, OUT_DIR, prefix), inputs
+
+    # Pages are rendered in parallel with --jobs but written here, in snapshot order
+    for inputs, (path, frontmatter, auto) in render_pages(testcase_page, stale(), args.jobs):
         existed = path.exists()
-        upsert_page(path, frontmatter, auto)
-        if existed:
+        text, changed = upsert_page(path, frontmatter, auto)
+        manifest.record(path, inputs, PAGE_VERSION, text)
+        if not changed:
+            unchanged += 1
+        elif existed:
             updated += 1
         else:
             created += 1
+    manifest.save()
+    # A full run removes the snippets no page imports any more
+    written = write_snippets("table", tables, prune=not args.key)
 
-    print(f"Generated pages. created={created} updated={updated}")
+    print(f"Generated pages. created={created} updated={updated} unchanged={unchanged}")
+    if snippets:
+        print(f"Shared step snippets: {len(tables)} ({written} written)")
 
 if __name__ == "__main__":
     main()